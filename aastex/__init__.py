@@ -52,7 +52,10 @@ bibliography.
 import pylatex
 
 from ._formatting import *
+from ._cache import *
+from ._report import *
 from ._aastex import *
+from ._authors import *
 
 text_width_inches = 513.11743 / 72
 """
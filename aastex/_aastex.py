@@ -1,12 +1,29 @@
+import asyncio
 import collections
+import concurrent.futures
+import contextlib
+import copy
 import dataclasses
+import itertools
+import logging
+import os
 import pathlib
+import pickle
+import re
 import shutil
+import subprocess
 import tarfile
+import tempfile
+import threading
+import time
 import zipfile
+from collections.abc import Callable, Iterable, Iterator, Mapping
 
+import matplotlib
 import matplotlib.figure
+import matplotlib.pyplot as plt
 import astropy.units as u
+import astropy.table
 import pylatex
 from pylatex import (
     Command,
@@ -16,7 +33,9 @@ from pylatex import (
     Label,
     Ref,
 )
-from . import _formatting
+from . import _formatting, _files, _figures, _compiler, _report, _stream
+from ._cache import RenderCache, FormatCache, _figure_key
+from ._report import BuildReport, Timing, Event
 
 __all__ = [
     "Command",
@@ -25,6 +44,7 @@ __all__ = [
     "Author",
     "Acronym",
     "Variable",
+    "VariableTable",
     "Abstract",
     "Section",
     "Subsection",
@@ -35,6 +55,7 @@ __all__ = [
     "RightFig",
     "Gridline",
     "Document",
+    "Variant",
     "NoEscape",
     "Package",
     "Marker",
@@ -44,28 +65,76 @@ __all__ = [
     "Bibliography",
 ]
 
+_log = logging.getLogger("aastex")
+
 
 @dataclasses.dataclass
-class Title(pylatex.base_classes.LatexObject):
+class _Memoized(pylatex.base_classes.LatexObject):
+    """
+    An object of the front matter which can remember its text, since the
+    front matter of a large collaboration can be thousands of objects which
+    rarely change between builds.
+    """
+
+    memoize: bool = dataclasses.field(
+        default=False,
+        kw_only=True,
+        repr=False,
+        compare=False,
+    )
+    """
+    Whether to remember the text of this object after it is first written,
+    instead of writing it again for every build.
+    Assigning to any attribute of this object forgets the text, but changing
+    a mutable attribute in place, such as a :class:`astropy.units.Quantity`,
+    does not.
+    """
+
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        self.__dict__.pop("_text", None)
+
+    def _memoized(self, dumps: Callable[[], str]) -> str:
+        """
+        The result of ``dumps``, which is only called again after an
+        attribute of this object changes, if :attr:`memoize` is set.
+        """
+        if not self.memoize:
+            return dumps()
+        try:
+            return self.__dict__["_text"]
+        except KeyError:
+            result = self.__dict__["_text"] = dumps()
+            return result
+
+
+@dataclasses.dataclass
+class Title(_Memoized):
     name: str
 
     def dumps(self) -> str:
+        return self._memoized(self._dumps)
+
+    def _dumps(self) -> str:
         return pylatex.Command("title", self.name).dumps()
 
 
 @dataclasses.dataclass
-class Affiliation(pylatex.base_classes.LatexObject):
+class Affiliation(_Memoized):
     """Organization that an author is associated with"""
 
     name: str
     """human-readable name of the organization"""
 
     def dumps(self) -> str:
+        return self._memoized(self._dumps)
+
+    def _dumps(self) -> str:
         return pylatex.Command("affiliation", self.name).dumps()
 
 
 @dataclasses.dataclass
-class Author(pylatex.base_classes.LatexObject):
+class Author(_Memoized):
     """One of the authors of this article"""
 
     name: str
@@ -102,6 +171,13 @@ class Author(pylatex.base_classes.LatexObject):
     """Whether this author is the corresponding author."""
 
     def dumps(self) -> str:
+        # The affiliations are separate objects which can change without this
+        # author knowing, so only the rest is remembered.
+        affiliation = "\n".join(a.dumps() for a in self.affiliations)
+        return f"{self._memoized(self._dumps)}\n{affiliation}"
+
+    def _dumps(self) -> str:
+        """The text of this author, besides their affiliations."""
 
         result = ""
 
@@ -143,9 +219,7 @@ class Author(pylatex.base_classes.LatexObject):
             options=show,
         ).dumps()
 
-        affiliation = "\n".join(a.dumps() for a in self.affiliations)
-
-        result += f"{author}\n{altaffiliation}{email}\n{affiliation}"
+        result += f"{author}\n{altaffiliation}{email}"
 
         return result
 
@@ -161,7 +235,7 @@ class Author(pylatex.base_classes.LatexObject):
 
 
 @dataclasses.dataclass
-class Acronym(pylatex.base_classes.LatexObject):
+class Acronym(_Memoized):
     r"""
     An acronym which is expanded on first use and abbreviated thereafter.
 
@@ -199,7 +273,10 @@ class Acronym(pylatex.base_classes.LatexObject):
     def __post_init__(self):
         self.packages.append(pylatex.Package("acronym"))
 
-    def dumps(self):
+    def dumps(self) -> str:
+        return self._memoized(self._dumps)
+
+    def _dumps(self) -> str:
         name_short = self.name_short
         if name_short is None:
             name_short = self.acronym
@@ -255,8 +332,54 @@ class Acronym(pylatex.base_classes.LatexObject):
         return command
 
 
+def _is_lazy(value) -> bool:
+    """Whether ``value`` is a function or a future which computes a value."""
+    return callable(value) or isinstance(value, concurrent.futures.Future)
+
+
+def _commands_used(chunks: Iterable[str], names: Iterable[str]) -> set[str]:
+    """
+    The ``names`` of LaTeX commands used in the text made of ``chunks``.
+
+    The chunks are searched one at a time, along with the end of the previous
+    one, so that the whole text is never held in memory at once, and a
+    command split between two chunks is still found.
+    A LaTeX command name ends at the first character which is not a letter,
+    so ``\\foo`` does not use ``\\fo``.
+    """
+    names = list(names)
+    if not names:
+        return set()
+
+    alternatives = "|".join(re.escape(name) for name in names)
+    pattern = re.compile(rf"\\({alternatives})(?![A-Za-z])")
+    longest = 1 + max(len(name) for name in names)
+
+    result = set()
+    tail = ""
+    for chunk in chunks:
+        text = tail + chunk
+        # A match at the very end may be the start of a longer name, which is
+        # only known once the next chunk arrives.
+        for match in pattern.finditer(text):
+            if match.end() < len(text):
+                result.add(match[1])
+        tail = text[-longest:]
+    result.update(pattern.findall(tail))
+    return result
+
+
+def _result(value):
+    """The value computed by a function or a future, or ``value`` itself."""
+    if isinstance(value, concurrent.futures.Future):
+        return value.result()
+    if callable(value):
+        return value()
+    return value
+
+
 @dataclasses.dataclass
-class Variable(pylatex.base_classes.LatexObject):
+class Variable(_Memoized):
     """
     A wrapper around the ``\\newcommand`` LaTeX command.
     """
@@ -264,8 +387,28 @@ class Variable(pylatex.base_classes.LatexObject):
     name: str
     """The name of the variable."""
 
-    value: float | u.Quantity
-    """The value of the variable."""
+    value: (
+        float
+        | u.Quantity
+        | Callable[[], float | u.Quantity]
+        | concurrent.futures.Future
+    )
+    """
+    The value of the variable, or a function or a future which computes it.
+
+    A function is not called until the value is needed, and
+    :meth:`Document.generate_pdf` computes the values of every such variable
+    used by the document at the same time, and skips the variables which are
+    never used.
+    """
+
+    def resolve(self) -> None:
+        """
+        Replace :attr:`value` with the value it computes, if it is a function
+        or a future, waiting for it if needed.
+        """
+        if _is_lazy(self.value):
+            self.value = _result(self.value)
 
     @property
     def _name(self) -> str:
@@ -273,21 +416,141 @@ class Variable(pylatex.base_classes.LatexObject):
 
     @property
     def _value(self) -> str:
+        self.resolve()
         v = self.value
         if isinstance(v, u.Quantity):
-            v = f"{v:latex_inline}"
+            v = _formatting._latex_quantity(v)
             v = rf"\ensuremath{{{v[1:~0]}}}"
         else:
             v = str(v)
         return NoEscape(v)
 
     def dumps(self) -> str:
+        return self._memoized(self._dumps)
+
+    def _dumps(self) -> str:
         return Command(
             command="newcommand",
             arguments=[self._name, self._value],
         ).dumps()
 
 
+@dataclasses.dataclass
+class _QuantityVariable(Variable):
+    """
+    A variable written in the same way as
+    :meth:`Document.set_variable_quantity` writes it, so that its value can be
+    computed later.
+    """
+
+    scientific_notation: None | bool = None
+    """Flag controlling whether to use scientific notation."""
+
+    digits_after_decimal: int = 3
+    """Number of digits to include after the decimal."""
+
+    @property
+    def _value(self) -> str:
+        self.resolve()
+        return NoEscape(
+            _formatting.format_quantity(
+                a=self.value,
+                scientific_notation=self.scientific_notation,
+                digits_after_decimal=self.digits_after_decimal,
+            )
+        )
+
+
+class VariableTable(pylatex.base_classes.LatexObject):
+    """
+    Many ``\\newcommand`` LaTeX commands at once, with the same text as
+    calling :meth:`Document.set_variable_quantity` for each of them.
+
+    The quantities with the same units are formatted together as one array,
+    and their units are only formatted once, so that defining thousands of
+    variables stays cheap.
+
+    Parameters
+    ----------
+    values
+        The values of the variables, either a mapping from the name of each
+        variable to its value, or a table with the columns ``name`` and
+        ``value``.
+        Values which are not an instance of :class:`astropy.units.Quantity`
+        are written like :meth:`Document.set_variable` writes them.
+    scientific_notation
+        Flag controlling whether to use scientific notation.
+        If :obj:`None`, scientific notation is used for each value whose
+        magnitude is not greater than 0.1.
+    digits_after_decimal
+        Number of digits to include after the decimal
+
+    Examples
+    --------
+
+    Define a variable for each row of a table of results:
+
+    .. code-block:: python
+
+        results = astropy.table.QTable(
+            dict(
+                name=["speedOfLight", "speedOfSound"],
+                value=[3e8, 343] * u.m / u.s,
+            )
+        )
+
+        doc.set_variables(results)
+    """
+
+    def __init__(
+        self,
+        values: Mapping[str, float | str | u.Quantity] | astropy.table.Table,
+        scientific_notation: None | bool = None,
+        digits_after_decimal: int = 3,
+    ):
+        super().__init__()
+
+        kwargs = dict(
+            scientific_notation=scientific_notation,
+            digits_after_decimal=digits_after_decimal,
+        )
+
+        if isinstance(values, astropy.table.Table):
+            column = values["value"]
+            if not isinstance(column, u.Quantity) and column.unit is not None:
+                column = u.Quantity(column)
+            values = {str(name): value for name, value in zip(values["name"], column)}
+
+        self._values = dict.fromkeys(values)
+        units = collections.defaultdict(list)
+        for name, value in values.items():
+            if not isinstance(value, u.Quantity):
+                self._values[name] = pylatex.utils.escape_latex(value)
+            elif value.ndim != 0:
+                self._values[name] = _formatting.format_quantity(value, **kwargs)
+            else:
+                units[value.unit].append(name)
+
+        for unit, names in units.items():
+            a = u.Quantity([values[name].value for name in names], unit)
+            text = _formatting._format_scalars(a, **kwargs)
+            self._values.update(zip(names, text))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def names(self) -> list[str]:
+        """The name of each variable."""
+        return list(self._values)
+
+    def dumps(self) -> str:
+        return "%\n".join(
+            f"\\newcommand{{\\{name}}}{{{value}}}"
+            for name, value in self._values.items()
+        )
+
+
 class Abstract(pylatex.base_classes.Environment):
     def __init__(
         self,
@@ -360,8 +623,17 @@ class Image:
     name: str
     """The name of this image inside the build directory."""
 
-    figure: None | matplotlib.figure.Figure = None
-    """A :mod:`matplotlib` figure to save, if this image is generated."""
+    figure: None | matplotlib.figure.Figure | Callable[[], matplotlib.figure.Figure] = (
+        None
+    )
+    """
+    A :mod:`matplotlib` figure to save, if this image is generated.
+
+    This can also be a function without arguments which creates the figure,
+    in which case the figure is only created when this image is written, and
+    is closed right after it is saved, so that a document with many figures
+    only needs to hold one of them in memory at a time.
+    """
 
     source: None | pathlib.Path = None
     """The current location of this image, if it is an existing file."""
@@ -372,17 +644,206 @@ class Image:
     kwargs: dict = dataclasses.field(default_factory=dict)
     """Extra keyword arguments passed to :meth:`matplotlib.figure.Figure.savefig`."""
 
-    def write(self, directory: pathlib.Path) -> pathlib.Path:
+    alias: None | str = None
+    """
+    The name of another image with identical contents which is stored in the
+    build directory in place of this one, if the document was deduplicated by
+    :meth:`Document.generate_pdf`.
+    """
+
+    _drawn: None | tuple[str, str] = dataclasses.field(
+        default=None,
+        init=False,
+        repr=False,
+        compare=False,
+    )
+    """
+    The key of :attr:`figure` in a :class:`RenderCache` from before it was
+    last saved, and its key right after, since drawing a figure changes its
+    key even though it still looks the same.
+    """
+
+    @property
+    def filename(self) -> str:
+        """
+        The name of the file in the build directory which holds this image,
+        which is :attr:`name` unless this image is stored as an :attr:`alias`.
+        """
+        if self.alias is not None:
+            return self.alias
+        return self.name
+
+    def write(
+        self,
+        directory: pathlib.Path,
+        *,
+        cache: None | RenderCache = None,
+        incremental: bool = False,
+        link: str = "copy",
+        release: bool = False,
+        draft: bool = False,
+        rasterize_threshold: None | int = None,
+    ) -> pathlib.Path:
         """
         Save or copy this image into ``directory`` and return its new location.
+
+        Parameters
+        ----------
+        directory
+            The build directory.
+        cache
+            An optional cache of previously saved figures.
+            If this image is generated and the same figure was saved before,
+            the file is copied from the cache instead of saved again.
+        incremental
+            Whether to leave the file in ``directory`` alone if it already
+            has the right contents, so that its modification time only changes
+            when the image does.
+        link
+            How to put an existing image file into ``directory``, either
+            ``"copy"``, ``"hardlink"``, ``"reflink"``, or ``"symlink"``.
+            Anything but a copy avoids duplicating large images, and if the
+            filesystem does not support the requested kind of link, the file is
+            copied instead.
+        release
+            Whether to close :attr:`figure` once it is saved, and refer to the
+            saved file from then on as :attr:`source`, so that the figure
+            does not stay in memory for as long as this image does.
+            A figure saved for a draft is never released, since it needs to be
+            saved again at full quality for the final version.
+        draft
+            Whether to save :attr:`figure` quickly at a low resolution,
+            rasterizing the data of any vector graphics with many points,
+            for a draft of the document.
+        rasterize_threshold
+            If :attr:`figure` is saved as vector graphics, the number of points
+            an artist inside its axes must draw to be rasterized, which keeps
+            dense plots from producing enormous files that are slow to
+            compile.
+            If :obj:`None`, nothing is rasterized, except in a draft.
         """
         destination = directory / self.name
         if self.figure is not None:
-            self.figure.savefig(destination, *self.args, **self.kwargs)
+            if incremental:
+                fd, temporary = tempfile.mkstemp(
+                    dir=directory,
+                    suffix=destination.suffix,
+                )
+                os.close(fd)
+                temporary = pathlib.Path(temporary)
+                try:
+                    self._save(temporary, cache, draft, rasterize_threshold)
+                except BaseException:
+                    temporary.unlink(missing_ok=True)
+                    raise
+                _files._replace(temporary, destination)
+            else:
+                _files._detach(destination)
+                self._save(destination, cache, draft, rasterize_threshold)
         elif self.source.resolve() != destination.resolve():
-            shutil.copyfile(self.source, destination)
+            _files._copy(
+                source=self.source,
+                destination=destination,
+                incremental=incremental,
+                link=link,
+            )
+        if release and not draft:
+            self._release(destination)
         return destination
 
+    def _release(self, destination: pathlib.Path) -> None:
+        """
+        Close :attr:`figure` and refer to the file it was saved to instead.
+        """
+        figure = self.figure
+        if figure is None:
+            return
+        if isinstance(figure, matplotlib.figure.Figure):
+            plt.close(figure)
+        self.figure = None
+        self.source = destination.resolve()
+
+    def _save(
+        self,
+        destination: pathlib.Path,
+        cache: None | RenderCache,
+        draft: bool = False,
+        rasterize_threshold: None | int = None,
+    ) -> None:
+        """
+        Save :attr:`figure` to ``destination``, or copy it from ``cache`` if
+        it was saved before.
+        """
+        figure = self.figure
+        lazy = not isinstance(figure, matplotlib.figure.Figure)
+        if lazy:
+            figure = figure()
+
+        kwargs = self.kwargs
+        if draft:
+            kwargs = kwargs | dict(dpi=_figures._draft_dpi)
+            if rasterize_threshold is None:
+                rasterize_threshold = _figures._draft_threshold
+            else:
+                rasterize_threshold = min(
+                    rasterize_threshold,
+                    _figures._draft_threshold,
+                )
+
+        heavy = []
+        if rasterize_threshold is not None:
+            if destination.suffix in _figures._vector_suffixes:
+                heavy = _figures._heavy_artists(figure, rasterize_threshold)
+                if heavy:
+                    _log.info(
+                        f"rasterizing {len(heavy)} artists drawing "
+                        f"{sum(_figures._points(a) for a in heavy)} points in "
+                        f"{self.name!r}, since each draws at least "
+                        f"{rasterize_threshold} points"
+                    )
+
+        try:
+            with _figures._rasterized(heavy):
+                key = None
+                if cache is not None:
+                    try:
+                        key = _figure_key(
+                            figure=figure,
+                            args=self.args,
+                            kwargs=kwargs,
+                            suffix=destination.suffix,
+                        )
+                    except (pickle.PicklingError, TypeError, AttributeError) as e:
+                        # Such as a figure with a formatter defined by a lambda.
+                        _log.warning(
+                            f"saving {self.name!r} without the cache, since its "
+                            f"figure cannot be pickled: {e}"
+                        )
+
+                if key is None:
+                    _figures._savefig(figure, destination, *self.args, **kwargs)
+                    return
+
+                # If the figure has not changed since it was last saved, use
+                # the key it had before saving drew it.
+                if not lazy and self._drawn is not None and self._drawn[1] == key:
+                    key = self._drawn[0]
+
+                if not cache.fetch(key, destination):
+                    _figures._savefig(figure, destination, *self.args, **kwargs)
+                    cache.store(key, destination)
+                    if not lazy:
+                        drawn = _figure_key(
+                            figure=figure,
+                            args=self.args,
+                            kwargs=kwargs,
+                            suffix=destination.suffix,
+                        )
+                        self._drawn = (key, drawn)
+        finally:
+            if lazy:
+                plt.close(figure)
+
     def is_same_file(self, other: "Image") -> bool:
         """
         Whether this image and ``other`` are the same file on disk.
@@ -395,37 +856,356 @@ class Image:
         return self.source == other.source
 
 
-def _descendants(obj: object) -> list:
+class _ImageReference(pylatex.base_classes.LatexObject):
+    """
+    The name of an image as it appears in the ``.tex`` file.
+
+    The name is looked up when the document is written rather than when the
+    image is added, since deduplicating the images of a document can change
+    which file holds it.
+    """
+
+    def __init__(self, image: Image, fix: bool = True):
+        super().__init__()
+        self.image = image
+        self.fix = fix
+
+    def dumps(self) -> str:
+        if self.fix:
+            return pylatex.utils.fix_filename(self.image.filename)
+        return self.image.filename
+
+
+def _deduplicate(
+    images: list[Image],
+    directory: pathlib.Path,
+    digests: dict[str, Image],
+    generated: bool = False,
+) -> list[Image]:
+    """
+    Point each image in ``images`` whose contents are already in ``digests``
+    at the image stored with those contents, and return the rest.
+
+    If ``generated``, the images are looked for in ``directory``, and so must
+    already have been written there, and the file of an image which is found
+    to be a duplicate is removed.
+    Writing an image can release its figure, so whether it was generated is
+    not known from the image itself by then.
+    """
+    result = []
+    for image in images:
+        if generated:
+            path = directory / image.name
+        else:
+            path = image.source
+        digest = _files._digest(path)
+        original = digests.setdefault(digest, image)
+        if original is image:
+            result.append(image)
+            continue
+        image.alias = original.name
+        if generated:
+            path.unlink()
+    return result
+
+
+def _write_placeholders(images: list[Image], directory: pathlib.Path) -> None:
+    """
+    Write a blank page in place of each image in ``images``, the same size as
+    the image, and have the ``.tex`` file refer to that instead.
+
+    The size is read from the :mod:`matplotlib` figure, or the source of an
+    existing file.
+    A function which creates a figure is not called, so its size is read
+    from the file of the previous build in ``directory``, if there is one.
+    Otherwise, the image is the size of a default :mod:`matplotlib` figure.
+    """
+    for image in images:
+        size = None
+        if isinstance(image.figure, matplotlib.figure.Figure):
+            size = image.figure.get_size_inches()
+        elif image.figure is None:
+            size = _figures._size(image.source)
+        else:
+            size = _figures._size(directory / image.name)
+        if size is None:
+            size = matplotlib.rcParams["figure.figsize"]
+        width, height = size
+        image.alias = f"{pathlib.Path(image.name).stem}-placeholder.pdf"
+        _figures._placeholder(directory / image.alias, width, height)
+
+
+def _write_image(
+    image: Image,
+    directory: pathlib.Path,
+    rc: dict,
+    cache: None | RenderCache,
+    kwargs: dict,
+) -> tuple[int, int, Timing]:
+    """
+    Write ``image`` into ``directory`` using the :mod:`matplotlib` settings
+    ``rc``, and return the number of cache hits and misses, and how long it
+    took.
+
+    This is what runs inside a worker process, which does not share the
+    :data:`matplotlib.rcParams` of the process that started it, so they are
+    passed along to make the result identical to writing the image directly.
+    The worker cannot update the counters of the original cache either, so
+    it counts using its own copy and the caller adds up the results.
+    """
+    if cache is not None:
+        cache = copy.copy(cache)
+        cache.hits = cache.misses = 0
+
+    with _report._timed(image.name) as timing:
+        with matplotlib.rc_context(rc):
+            image.write(directory, cache=cache, **kwargs)
+
+    if cache is None:
+        return 0, 0, timing
+    return cache.hits, cache.misses, timing
+
+
+def _ignore(*args) -> None:
+    """Do nothing, in place of an optional callback."""
+
+
+def _write_images(
+    images: list[Image],
+    directory: pathlib.Path,
+    executor: None | concurrent.futures.Executor = None,
+    cache: None | RenderCache = None,
+    deduplicate: bool = False,
+    on_write: None | Callable[[Timing, int], None] = None,
+    **kwargs,
+) -> None:
     """
-    Recursively gather ``obj`` and everything it contains.
+    Write every image in ``images`` into ``directory``.
+
+    Each file is only written once, even if it is used by several figures,
+    and two different images which would overwrite each other are an error.
+
+    Parameters
+    ----------
+    images
+        The images to write.
+    directory
+        The build directory.
+    executor
+        An optional executor to write the images concurrently.
+        If :obj:`None`, the images are written one at a time.
+    cache
+        An optional cache of previously saved figures.
+    deduplicate
+        Whether to store images with identical contents only once, even if
+        they have different names, by setting :attr:`Image.alias`.
+    on_write
+        An optional function called after each image is written, with how
+        long it took and the number of images being written.
+    kwargs
+        Additional keyword arguments passed to :meth:`Image.write`.
+    """
+    if on_write is None:
+        on_write = _ignore
+
+    seen = {}
+    for image in images:
+        image.alias = None
+        other = seen.get(image.name)
+        if other is not None:
+            if not image.is_same_file(other):
+                raise ValueError(
+                    f"two different images are named {image.name!r}, which "
+                    f"usually means two figures share the label "
+                    f"{pathlib.Path(image.name).stem!r}"
+                )
+            continue
+        seen[image.name] = image
+
+    unique = list(seen.values())
+
+    # Existing files can be compared before they are written, which saves
+    # writing the duplicates, but generated images can only be compared
+    # afterwards.
+    digests = {}
+    generated = [image for image in unique if image.figure is not None]
+    if deduplicate:
+        existing = [image for image in unique if image.figure is None]
+        kept = {id(image) for image in _deduplicate(existing, directory, digests)}
+        unique = [i for i in unique if i.figure is not None or id(i) in kept]
+
+    if executor is None:
+        for image in unique:
+            with _report._timed(image.name) as timing:
+                image.write(directory, cache=cache, **kwargs)
+            timing.bytes = _report._size(directory / image.name)
+            on_write(timing, len(unique))
+    else:
+        _submit_images(unique, directory, executor, cache, on_write, kwargs)
+
+    if deduplicate:
+        _deduplicate(generated, directory, digests, generated=True)
+
+    # An image which shares its name with another is stored in the same file,
+    # so it is deduplicated along with it.
+    for image in images:
+        original = seen[image.name]
+        if original is not image:
+            image.alias = original.alias
+
+
+def _submit_images(
+    images: list[Image],
+    directory: pathlib.Path,
+    executor: concurrent.futures.Executor,
+    cache: None | RenderCache,
+    on_write: Callable[[Timing, int], None],
+    kwargs: dict,
+) -> None:
+    """
+    Write every image in ``images`` into ``directory`` using ``executor``,
+    calling ``on_write`` as each one finishes, as described in
+    :func:`_write_images`.
+    """
+    rc = {k: v for k, v in matplotlib.rcParams.items() if k != "backend"}
+
+    futures = [
+        executor.submit(_write_image, image, directory, rc, cache, kwargs)
+        for image in images
+    ]
+    try:
+        for image, future in zip(images, futures):
+            try:
+                hits, misses, timing = future.result()
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                # Such as a figure with a formatter defined by a lambda, which
+                # cannot be sent to another process.
+                # Any other error is raised again by writing the image here.
+                _log.warning(
+                    f"saving {image.name!r} in this process, since it cannot "
+                    f"be sent to a worker: {e}"
+                )
+                hits, misses, timing = _write_image(image, directory, rc, cache, kwargs)
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+            timing.bytes = _report._size(directory / image.name)
+            on_write(timing, len(images))
+            # The worker released its own copy of the image, if it was in
+            # another process, so release the original here as well.
+            if kwargs.get("release", False):
+                image._release(directory / image.name)
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _reject_options(method: str, kwargs: Mapping) -> None:
+    """
+    Raise :class:`TypeError` if ``kwargs`` has any of the options of
+    :meth:`Document.generate_pdf` which ``method`` does not support, since they
+    are only applied while that method compiles the document.
+    """
+    unsupported = {"format_cache", "include", "include_only"} & kwargs.keys()
+    if unsupported:
+        raise TypeError(
+            f"{method}() does not support {', '.join(sorted(unsupported))}, "
+            f"which only generate_pdf() does"
+        )
+
+
+_support_files = ("aastex701.cls", "aasjournalv7.bst", "orcid-ID.png")
+"""The files shipped with this package which every ``.tex`` file needs."""
+
+
+def _copy_support_files(
+    directory: pathlib.Path,
+    incremental: bool = False,
+) -> list[pathlib.Path]:
+    """
+    Copy the files in :data:`_support_files` into ``directory``, and return
+    the copies of the files of this package which are there now.
+
+    If ``incremental``, a file which differs from the one in this package,
+    such as one copied by an older version of it, is replaced, and one which
+    is already up to date is left alone.
+    Otherwise, a file which differs is left alone, since it was put there by
+    someone else, and one which is identical was copied by an earlier build.
+    """
+    base = pathlib.Path(__file__).parent
+
+    copies = []
+    for name in _support_files:
+        source = base / name
+        destination = directory / name
+        if incremental:
+            _files._copy(source, destination, incremental=True)
+        elif not destination.exists():
+            shutil.copyfile(source, destination)
+        elif not _files._up_to_date(source, destination):
+            continue
+        copies.append(destination)
+
+    return copies
+
+
+def _descendants(obj: object) -> Iterator:
+    """
+    Gather ``obj`` and everything it contains, in the order they appear.
 
     Both the children of containers and the arguments of commands are
     searched, since figures can appear inside either.
+    The tree is walked using an explicit stack rather than recursion, so that
+    deeply nested documents do not reach the recursion limit.
     """
-    if isinstance(obj, str):
-        return []
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
 
-    result = [obj]
+        if isinstance(obj, str):
+            continue
 
-    if isinstance(obj, (list, tuple, collections.UserList)):
-        for child in obj:
-            result += _descendants(child)
+        yield obj
 
-    arguments = getattr(obj, "arguments", None)
-    if arguments is not None:
-        for child in getattr(arguments, "_positional_args", []):
-            result += _descendants(child)
+        children = []
 
-    return result
+        if isinstance(obj, (list, tuple, collections.UserList)):
+            children.extend(obj)
+
+        arguments = getattr(obj, "arguments", None)
+        if arguments is not None:
+            children.extend(getattr(arguments, "_positional_args", []))
 
+        stack.extend(reversed(children))
 
-def _images(obj: object) -> list[Image]:
+
+@dataclasses.dataclass
+class _Index:
     """
-    Recursively gather the images referenced by ``obj`` and its children.
+    The objects in a document which are needed to build it, gathered in a
+    single walk of the document.
     """
-    result = []
-    for descendant in _descendants(obj):
-        result += getattr(descendant, "_aastex_images", [])
+
+    images: list[Image] = dataclasses.field(default_factory=list)
+    """Every image in the document, in the order they appear."""
+
+    bibliographies: list["Bibliography"] = dataclasses.field(default_factory=list)
+    """Every bibliography in the document."""
+
+    def add(self, obj: object) -> None:
+        """Index ``obj`` and everything it contains."""
+        for descendant in _descendants(obj):
+            self.images += getattr(descendant, "_aastex_images", [])
+            if isinstance(descendant, Bibliography):
+                self.bibliographies.append(descendant)
+
+
+def _index(obj: object) -> _Index:
+    """
+    Index ``obj`` and everything it contains.
+    """
+    result = _Index()
+    result.add(obj)
     return result
 
 
@@ -512,15 +1292,15 @@ class Figure(
         image = Image(name=filename.name, source=filename.resolve())
         self._aastex_images.append(image)
 
-        super().add_image(
-            filename=image.name,
+        self._add_image(
+            image=image,
             width=width,
             placement=placement,
         )
 
     def add_fig(
         self,
-        fig: matplotlib.figure.Figure,
+        fig: matplotlib.figure.Figure | Callable[[], matplotlib.figure.Figure],
         *args,
         extension: str = "pdf",
         filename: None | str = None,
@@ -536,7 +1316,14 @@ class Figure(
         Parameters
         ----------
         fig
-            :mod:`matplotlib` figure to add to this document
+            :mod:`matplotlib` figure to add to this document, or a function
+            without arguments which creates it.
+            A function defers creating the figure until it is saved, and the
+            figure is closed afterwards, so that the figures of a document do
+            not all need to fit in memory at once.
+            To save the figures using several processes, the function must be
+            picklable, so it should be defined at the top level of a module
+            rather than as a ``lambda``.
         args
             Arguments passed to plt.savefig for displaying the plot.
         extension
@@ -569,11 +1356,22 @@ class Figure(
         )
         self._aastex_images.append(image)
 
-        super().add_image(
-            filename=image.name,
+        self._add_image(
+            image=image,
             **add_image_kwargs,
         )
 
+    def _add_image(self, image: Image, **kwargs) -> None:
+        """
+        Add an ``\\includegraphics`` command for ``image`` to this figure.
+        """
+        super().add_image(filename=image.name, **kwargs)
+
+        # Refer to the image by whichever file ends up holding it, which is
+        # only known once the document is compiled.
+        graphic = self[-1]
+        graphic.arguments = pylatex.base_classes.Arguments(_ImageReference(image))
+
     def add_caption(self, caption) -> None:
         super().add_caption(caption)
         self.append(self._label)
@@ -600,22 +1398,55 @@ class FigureStar(
 class Fig(pylatex.base_classes.CommandBase):
     r"""
     An AASTeX 6+ `\fig command <https://journals.aas.org/aastex-v6-3-author-guide/#new_figure_features>`_
+
+    Parameters
+    ----------
+    file
+        The location of an existing image file, or a :mod:`matplotlib` figure,
+        or a function without arguments which creates one.
+        As with :meth:`Figure.add_fig`, a figure is saved, and a function is
+        called, only when the document is compiled.
+    width
+        The width of the image in the compiled document.
+    caption
+        The caption of this panel.
+    filename
+        The name to save a generated image as, without the extension.
+        This is required unless ``file`` is the location of an existing image.
+    extension
+        The file type extension to save a generated image as.
     """
 
     def __init__(
         self,
-        file: str | pathlib.Path,
+        file: (
+            str
+            | pathlib.Path
+            | matplotlib.figure.Figure
+            | Callable[[], matplotlib.figure.Figure]
+        ),
         width: str,
         caption: str,
+        *,
+        filename: None | str = None,
+        extension: str = "pdf",
     ):
-        file = pathlib.Path(file)
+        if isinstance(file, matplotlib.figure.Figure) or callable(file):
+            if filename is None:
+                raise ValueError("a filename is required for a generated image")
+            image = Image(
+                name=f"{filename}.{extension.strip('.')}",
+                figure=file,
+            )
+        else:
+            file = pathlib.Path(file)
+            image = Image(name=file.name, source=file.resolve())
 
-        image = Image(name=file.name, source=file.resolve())
         self._aastex_images = [image]
 
         super().__init__(
             arguments=[
-                NoEscape(image.name),
+                _ImageReference(image, fix=False),
                 width,
                 caption,
             ]
@@ -651,6 +1482,34 @@ class Gridline(pylatex.base_classes.CommandBase):
         )
 
 
+@dataclasses.dataclass
+class Variant:
+    """
+    The result of compiling one variant of a document using
+    :meth:`Document.generate_variants`.
+    """
+
+    name: str
+    """The name of this variant."""
+
+    filepath: pathlib.Path
+    """The name of the compiled file (without the ``.pdf`` extension)."""
+
+    document_options: list[str]
+    """The options passed to the AASTeX class for this variant."""
+
+    seconds: float = 0
+    """How long the LaTeX compiler took to compile this variant."""
+
+    error: None | Exception = None
+    """The error raised while compiling this variant, if it failed."""
+
+    @property
+    def ok(self) -> bool:
+        """Whether this variant compiled successfully."""
+        return self.error is None
+
+
 class Document(pylatex.Document):
     """
     An article using the AASTeX class.
@@ -663,6 +1522,20 @@ class Document(pylatex.Document):
         <https://journals.aas.org/pre-submission-checklist-for-aas-journal-authors/>`_
         for review, so they are on by default, and can be turned off for a
         version meant to be read rather than reviewed.
+    draft
+        Whether this is a draft of the article, which is quicker to compile
+        repeatedly while writing.
+        The figures are saved at a low resolution, with the data of any dense
+        vector plots rasterized, and AASTeX marks overfull lines.
+        The images are still drawn in full.
+        Turning this off gives the final version at full quality without
+        changing how the figures are made.
+    on_event
+        An optional function which is called with an :class:`Event` as each
+        stage of a build makes progress, such as each image being written or
+        each pass of the compiler finishing, so that long builds can show
+        their progress.
+        It is called from whichever thread is doing the work.
     """
 
     def __init__(
@@ -681,6 +1554,8 @@ class Document(pylatex.Document):
         geometry_options: None | dict = None,
         data: None | list = None,
         linenumbers: bool = True,
+        draft: bool = False,
+        on_event: None | Callable[[Event], None] = None,
     ):
         if document_options is None:
             document_options = ["twocolumn"]
@@ -692,6 +1567,9 @@ class Document(pylatex.Document):
         if linenumbers and "linenumbers" not in document_options:
             document_options.append("linenumbers")
 
+        if draft and "draft" not in document_options:
+            document_options.append("draft")
+
         super().__init__(
             default_filepath=str(default_filepath),
             documentclass=documentclass,
@@ -709,11 +1587,197 @@ class Document(pylatex.Document):
         )
         self.escape = False
         self.preamble.append(pylatex.Command("bibliographystyle", "aasjournalv7"))
+        if draft:
+            # The class passes its options on to graphicx, which would
+            # otherwise draw only the outline of each image.
+            self.preamble.append(Command("setkeys", arguments=["Gin", "draft=false"]))
+        self.draft = draft
+        self.on_event = on_event
+        self._build_index: None | _Index = None
+        self._build_includes: list[pathlib.Path] = []
+        self._format: None | str = None
+        self._skipped_variables: set[int] = set()
+
+    def _emit(self, kind: str, **kwargs) -> None:
+        """Send an :class:`Event` to :attr:`on_event`, if it is set."""
+        if self.on_event is not None:
+            self.on_event(Event(kind, **kwargs))
+
+    def _dumps_format_preamble(self) -> str:
+        """
+        The part of the preamble which is dumped into a format file by
+        :class:`FormatCache`, which is the document class and the packages.
+        """
+        return self.documentclass.dumps() + "%\n" + self.dumps_packages() + "%\n"
+
+    def _dumps_head(self) -> str:
+        """
+        The preamble of this document, which comes before the
+        ``document`` environment.
+        """
+        if self._format is None:
+            head = self._dumps_format_preamble()
+        else:
+            # The first line tells pdfLaTeX to load the format, and
+            # mylatexformat skips everything up to the end of the part of the
+            # preamble which was dumped into it.
+            head = f"%&{self._format}\n"
+            head += self._dumps_format_preamble()
+            head += r"\csname endofdump\endcsname" + "%\n"
+        head += pylatex.utils.dumps_list(self._used(self.variables)) + "%\n"
+        head += pylatex.utils.dumps_list(self._used(self.preamble)) + "%\n"
+        return head + "%\n"
+
+    def _used(self, items: list) -> list:
+        """``items`` without the variables skipped by :meth:`_resolving`."""
+        if not self._skipped_variables:
+            return items
+        return [item for item in items if id(item) not in self._skipped_variables]
+
+    def dumps(self) -> str:
+        return self._dumps_head() + super(pylatex.Document, self).dumps()
+
+    def iterdumps(self) -> Iterator[str]:
+        """
+        The same text as :meth:`dumps`, in chunks, so that the text of a
+        large document can be written without holding all of it in memory at
+        once.
+
+        :meth:`generate_pdf` writes the ``.tex`` file this way.
+
+        Examples
+        --------
+
+        Write the text of an article to the standard output:
+
+        .. code-block:: python
+
+            for chunk in doc.iterdumps():
+                sys.stdout.write(chunk)
+        """
+        yield self._dumps_head()
+        yield from _stream._iterdumps_environment(self)
+
+    def dump(self, file_w) -> None:
+        for chunk in self.iterdumps():
+            file_w.write(chunk)
+
+    def _load_format(
+        self,
+        directory: pathlib.Path,
+        format_cache: FormatCache,
+        compiler: None | str = None,
+    ) -> list[pathlib.Path]:
+        """
+        Put the format file of this document into ``directory``, dumping it
+        first if it is not in ``format_cache``, and have the ``.tex`` file
+        load it.
+
+        Returns the format file if it was put into ``directory``.
+        The formats are dumped by pdfTeX, so any ``compiler`` other than
+        ``latexmk`` or ``pdflatex`` compiles the document as usual.
+        """
+        if compiler is not None and pathlib.Path(compiler).name not in (
+            "latexmk",
+            "pdflatex",
+        ):
+            _log.warning(
+                f"compiling without a precompiled preamble, which only "
+                f"pdfLaTeX can load, not {compiler!r}"
+            )
+            return []
+
+        preamble = self._dumps_format_preamble()
+        key = format_cache.key(preamble)
+        try:
+            format_cache.build(key, preamble)
+        except (OSError, subprocess.CalledProcessError) as e:
+            _log.warning(f"compiling without a precompiled preamble: {e}")
+            return []
+
+        destination = directory / f"{key}.fmt"
+        _files._copy(
+            source=format_cache.path(key),
+            destination=destination,
+            incremental=True,
+            link="hardlink",
+        )
+        self._format = key
+        return [destination]
+
+    def _variable_names(self) -> set[str]:
+        """The name of every variable defined in the preamble."""
+        result = set()
+        for variable in self.variables:
+            if isinstance(variable, VariableTable):
+                result.update(variable.names)
+            elif isinstance(variable, Variable):
+                result.add(variable.name)
+            else:
+                result.add(variable.arguments._positional_args[0][1:])
+        return result
+
+    def set_variable(self, name: str, value: str) -> None:
+        """
+        Add a variable which can be used inside the document, like
+        :meth:`pylatex.document.Document.set_variable`, but also aware of the
+        variables defined by :meth:`set_variables`.
+
+        Parameters
+        ----------
+        name
+            The name to set for the variable
+        value
+            The value to set for the variable
+        """
+        arguments = [NoEscape(f"\\{name}"), value]
+        if name in self._variable_names():
+            self.append(Command(command="renewcommand", arguments=arguments))
+        else:
+            self.variables.append(Command(command="newcommand", arguments=arguments))
+
+    def set_variables(
+        self,
+        values: Mapping[str, float | str | u.Quantity] | astropy.table.Table,
+        scientific_notation: None | bool = None,
+        digits_after_decimal: int = 3,
+    ) -> None:
+        """
+        Similar to :meth:`set_variable_quantity`, but defines many variables
+        at once using a :class:`VariableTable`, which is much faster for
+        thousands of variables.
+
+        Variables which are already defined are redefined in the same way as
+        :meth:`set_variable` does.
+
+        Parameters
+        ----------
+        values
+            The values of the variables, either a mapping from the name of
+            each variable to its value, or a table with the columns ``name``
+            and ``value``.
+        scientific_notation
+            Flag controlling whether to use scientific notation.
+            If :obj:`None`, scientific notation is used for each value whose
+            magnitude is not greater than 0.1.
+        digits_after_decimal
+            Number of digits to include after the decimal
+        """
+        table = VariableTable(
+            values=values,
+            scientific_notation=scientific_notation,
+            digits_after_decimal=digits_after_decimal,
+        )
+        defined = self._variable_names()
+        for name in table.names:
+            if name in defined:
+                self.set_variable(name, NoEscape(table._values.pop(name)))
+        self.variables.append(table)
 
     def set_variable_quantity(
         self,
         name: str,
-        value: u.Quantity,
+        value: u.Quantity | Callable[[], u.Quantity] | concurrent.futures.Future,
         scientific_notation: None | bool = None,
         digits_after_decimal: int = 3,
     ) -> None:
@@ -726,13 +1790,29 @@ class Document(pylatex.Document):
         name
             The name to set for the variable
         value
-            The value to set for the variable
+            The value to set for the variable, or a function or a future
+            which computes it when the document is built, as described in
+            :attr:`Variable.value`.
+            If a variable with this name is already defined, the value is
+            computed immediately instead.
         scientific_notation
             Flag controlling whether to use scientific notation.
             If :obj:`None`, scientific notation is used if ``np.all(values.abs() < .1)``
         digits_after_decimal
             Number of digits to include after the decimal
         """
+        if _is_lazy(value):
+            if name not in self._variable_names():
+                variable = _QuantityVariable(
+                    name=name,
+                    value=value,
+                    scientific_notation=scientific_notation,
+                    digits_after_decimal=digits_after_decimal,
+                )
+                self.variables.append(variable)
+                return
+            value = _result(value)
+
         self.set_variable(
             name=name,
             value=pylatex.NoEscape(
@@ -749,7 +1829,7 @@ class Document(pylatex.Document):
         """
         Every image referenced by this document, in the order they appear.
         """
-        return _images(self)
+        return _index(self).images
 
     def generate_pdf(
         self,
@@ -760,6 +1840,19 @@ class Document(pylatex.Document):
         compiler: None | str = None,
         compiler_args: None | list[str] = None,
         silent: bool = True,
+        workers: None | int = None,
+        executor: None | concurrent.futures.Executor = None,
+        cache: None | RenderCache = None,
+        incremental: bool = False,
+        link: str = "copy",
+        release: bool = False,
+        rasterize_threshold: None | int = None,
+        deduplicate: bool = False,
+        format_cache: None | FormatCache = None,
+        report: None | BuildReport = None,
+        include: bool = False,
+        include_only: None | list[Section | str] = None,
+        text_only: bool = False,
     ) -> None:
         """
         Generate a pdf file from this document.
@@ -768,7 +1861,8 @@ class Document(pylatex.Document):
         copied into the build directory before compiling, since the ``.tex``
         file expects to find them alongside itself.
         Any of these files already present in the build directory is left
-        alone, and only the copies made here are removed afterwards.
+        alone, unless it is a copy made by an earlier build, and only the
+        copies are removed afterwards.
 
         Every image in this document is also saved into the build directory,
         so that the build directory contains everything needed to compile the
@@ -791,8 +1885,369 @@ class Document(pylatex.Document):
             Extra arguments to pass to the LaTeX compiler.
         silent
             Whether to hide the output of the compiler.
+        workers
+            The number of processes to save the figures with.
+            If :obj:`None`, the figures are saved one at a time, unless
+            ``executor`` is given.
+            The figures are sent to the worker processes by pickling them,
+            and a figure which cannot be pickled, such as one with a formatter
+            defined by a ``lambda``, is saved in this process instead.
+        executor
+            An existing executor to save the figures with, instead of
+            starting a new process pool using ``workers``.
+            It is not shut down afterwards.
+        cache
+            An optional cache of previously saved figures, so that figures
+            which have not changed since the last build are copied instead of
+            saved again.
+        incremental
+            Whether to leave alone the files in the build directory which are
+            already up to date, and to keep the copies of the AASTeX files
+            for the next build even if ``clean_tex`` is :obj:`True`, replacing
+            any which differ from the files of this package,
+            so that repeated builds write as little as possible and the
+            modification times seen by ``latexmk`` only change when the files
+            do.
+        link
+            How to put the existing image files of this document into the build
+            directory, either ``"copy"``, ``"hardlink"``, ``"reflink"``, or
+            ``"symlink"``.
+            See :meth:`Image.write` for details.
+        release
+            Whether to close each :mod:`matplotlib` figure once it is saved,
+            and reuse the saved file for later builds and for
+            :meth:`generate_archive`, instead of keeping the figure in memory.
+        rasterize_threshold
+            The number of points an artist must draw to be rasterized when a
+            figure is saved as vector graphics.
+            If :obj:`None`, nothing is rasterized unless this is a draft.
+            See :meth:`Image.write` for details.
+        deduplicate
+            Whether to store images with identical contents only once, even if
+            they have different names, and have the ``.tex`` file refer to that
+            one file everywhere, which saves writing the duplicates and keeps
+            them out of :meth:`generate_archive`.
+        format_cache
+            An optional cache of precompiled preambles, so that the AASTeX
+            class and the packages are only read once for every compile of a
+            document with the same preamble, instead of on every pass.
+            If the preamble cannot be precompiled, or ``compiler`` is not
+            ``latexmk`` or ``pdflatex``, the document is compiled as usual.
+        report
+            An optional report to fill in with how long each stage of the
+            build took, including each image and each pass of the compiler.
+        include
+            Whether to write each top-level section of this document into its
+            own ``.tex`` file, named after the document and the label of the
+            section, which the main ``.tex`` file pulls in using ``\\include``.
+            Like any use of ``\\include``, this starts each of these sections
+            on a new page.
+        include_only
+            The top-level sections to compile, or their titles, which implies
+            ``include``.
+            Each of them must match a top-level section.
+            The other sections are left out using ``\\includeonly``, but their
+            page numbers and the references to them are kept from the last
+            build which included them, as long as ``clean`` was :obj:`False`
+            so that its ``.aux`` files were kept.
+        text_only
+            Whether to leave out the images, for a quick look at the text.
+            None of the figures are saved, and each image is drawn as an
+            empty box of the same size instead, so the layout of the text
+            stays much the same.
+            A function which creates a figure is not called, so its size is
+            taken from the file of the previous build, if there is one, or
+            else is the size of a default :mod:`matplotlib` figure.
         """
 
+        filepath, copies = self._prepare(
+            filepath=filepath,
+            workers=workers,
+            executor=executor,
+            cache=cache,
+            incremental=incremental,
+            link=link,
+            release=release,
+            rasterize_threshold=rasterize_threshold,
+            deduplicate=deduplicate,
+            report=report,
+            text_only=text_only,
+        )
+
+        self._build_includes = []
+        stack = contextlib.ExitStack()
+        try:
+            if format_cache is not None:
+                stage = contextlib.nullcontext()
+                if report is not None:
+                    stage = report.stage("format")
+                with stage:
+                    copies += self._load_format(filepath.parent, format_cache, compiler)
+            stack.enter_context(self._writing(report, text_only))
+            if include or include_only is not None:
+                self._build_includes = stack.enter_context(
+                    self._included(filepath, include_only)
+                )
+            if report is None and self.on_event is None:
+                super().generate_pdf(
+                    filepath=filepath,
+                    clean=clean,
+                    clean_tex=clean_tex,
+                    compiler=compiler,
+                    compiler_args=compiler_args,
+                    silent=silent,
+                )
+            else:
+                self._compile_streaming(
+                    filepath=filepath,
+                    report=report,
+                    clean=clean,
+                    clean_tex=clean_tex,
+                    compiler=compiler,
+                    compiler_args=compiler_args,
+                    silent=silent,
+                )
+        finally:
+            stack.close()
+            self._format = None
+            if clean_tex:
+                for destination in self._build_includes:
+                    destination.unlink(missing_ok=True)
+            if clean_tex and not incremental:
+                for destination in copies:
+                    destination.unlink(missing_ok=True)
+
+    @contextlib.contextmanager
+    def _resolving(self, report: None | BuildReport = None) -> Iterator[None]:
+        """
+        Compute the values of the lazy variables in the preamble which are
+        used by this document, all at the same time, and leave out the unused
+        ones until the end of the ``with`` statement.
+        """
+        lazy = [
+            item
+            for item in self.variables + self.preamble
+            if isinstance(item, Variable) and _is_lazy(item.value)
+        ]
+        if not lazy:
+            yield
+            return
+
+        stage = contextlib.nullcontext()
+        if report is not None:
+            stage = report.stage("variables")
+
+        with stage:
+            ids = {id(item) for item in lazy}
+            others = [i for i in self.variables + self.preamble if id(i) not in ids]
+            chunks = itertools.chain(
+                [pylatex.utils.dumps_list(others)],
+                _stream._iterdumps_environment(self),
+            )
+            used = _commands_used(chunks, {item.name for item in lazy})
+
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                futures = [
+                    executor.submit(item.resolve) for item in lazy if item.name in used
+                ]
+                for future in futures:
+                    future.result()
+
+        self._skipped_variables = {id(i) for i in lazy if i.name not in used}
+        try:
+            yield
+        finally:
+            self._skipped_variables = set()
+
+    @contextlib.contextmanager
+    def _writing(
+        self,
+        report: None | BuildReport = None,
+        text_only: bool = False,
+    ) -> Iterator[None]:
+        """
+        Get this document ready to be written for a build until the end of the
+        ``with`` statement, using :meth:`_resolving`, and
+        :meth:`_drafting_graphics` if ``text_only``.
+        """
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(self._resolving(report))
+            if text_only:
+                stack.enter_context(self._drafting_graphics())
+            yield
+
+    @contextlib.contextmanager
+    def _drafting_graphics(self) -> Iterator[None]:
+        """
+        Have the graphics package draw only the outline of each image until
+        the end of the ``with`` statement.
+        """
+        preamble = self.preamble
+        self.preamble = preamble + [Command("setkeys", arguments=["Gin", "draft"])]
+        try:
+            yield
+        finally:
+            self.preamble = preamble
+
+    @contextlib.contextmanager
+    def _included(
+        self,
+        filepath: pathlib.Path,
+        include_only: None | list[Section | str] = None,
+    ) -> Iterator[list[pathlib.Path]]:
+        """
+        Write each top-level section into its own ``.tex`` file next to
+        ``filepath``, and replace it with ``\\include`` until the end of the
+        ``with`` statement.
+
+        Yields the ``.tex`` files which were written.
+        """
+        # The packages of the sections are gathered now, since they will not
+        # be part of this document while they are replaced.
+        self._propagate_packages()
+
+        data = self.data
+        preamble = self.preamble
+
+        # The name of the file of each top-level section, keyed by its id.
+        files = {}
+        for i, item in enumerate(data):
+            if type(item) not in (Section, pylatex.Section):
+                continue
+            if isinstance(item.label, Label):
+                name = f"{filepath.name}-{item.label.marker.name}"
+            else:
+                name = f"{filepath.name}-{i}"
+            if name in files.values():
+                raise ValueError(
+                    f"two sections would be written to {name + '.tex'!r}, which "
+                    f"usually means they share the title {item.title!r}, so give "
+                    f"one of them a different label"
+                )
+            files[id(item)] = name
+
+        if include_only is not None:
+            titles = [item.title for item in data if id(item) in files]
+            missing = [
+                section
+                for section in include_only
+                if id(section) not in files and section not in titles
+            ]
+            if missing:
+                raise ValueError(
+                    f"no top-level section matches {missing!r} in `include_only`"
+                )
+
+        content = []
+        paths = []
+        names = []
+        for item in data:
+            name = files.get(id(item))
+            if name is None:
+                content.append(item)
+                continue
+            path = filepath.with_name(f"{name}.tex")
+            path.write_text(item.dumps() + "%\n")
+            paths.append(path)
+            content.append(pylatex.Command("include", NoEscape(name)))
+            if include_only is None or any(
+                section is item or section == item.title for section in include_only
+            ):
+                names.append(name)
+
+        self.data = content
+        self.preamble = list(preamble)
+        if include_only is not None:
+            only = pylatex.Command("includeonly", NoEscape(",".join(names)))
+            self.preamble.append(only)
+
+        try:
+            yield paths
+        finally:
+            self.data = data
+            self.preamble = preamble
+
+    def _compile_streaming(
+        self,
+        filepath: pathlib.Path,
+        report: None | BuildReport,
+        *,
+        clean: bool,
+        clean_tex: bool,
+        compiler: None | str,
+        compiler_args: None | list[str],
+        silent: bool,
+    ) -> None:
+        """
+        Write the ``.tex`` file and compile it in the same way as
+        :meth:`pylatex.Document.generate_pdf`, but watch the output of the
+        compiler as it runs to time each pass for ``report`` and send an
+        :class:`Event` as each pass starts and finishes.
+        """
+        if report is None:
+            report = BuildReport()
+
+        filepath = filepath.absolute()
+        tex = filepath.with_name(f"{filepath.name}.tex")
+
+        with report.stage("tex") as stage:
+            self.generate_tex(str(filepath))
+            stage.bytes = _report._size(tex)
+
+        start = len(report.passes)
+        passes = _report._PassTimer(report.passes, self.on_event)
+        with report.stage("compile") as stage:
+            try:
+                command = _compiler._synchronously(
+                    _compiler._compile(
+                        filepath=filepath,
+                        clean=clean,
+                        compiler=compiler,
+                        compiler_args=compiler_args,
+                        silent=silent,
+                        on_line=passes,
+                    )
+                )
+            finally:
+                passes.close()
+            stage.bytes = _report._size(filepath.with_name(f"{filepath.name}.pdf"))
+
+        # A compiler other than `latexmk` runs once and does not announce it.
+        if len(report.passes) == start:
+            name = pathlib.Path(command[0]).name
+            report.passes.append(dataclasses.replace(stage, name=name, bytes=0))
+
+        if clean_tex:
+            tex.unlink()
+
+    def _prepare(
+        self,
+        filepath: None | str | pathlib.Path = None,
+        *,
+        workers: None | int = None,
+        executor: None | concurrent.futures.Executor = None,
+        cache: None | RenderCache = None,
+        incremental: bool = False,
+        link: str = "copy",
+        release: bool = False,
+        rasterize_threshold: None | int = None,
+        deduplicate: bool = False,
+        report: None | BuildReport = None,
+        text_only: bool = False,
+    ) -> tuple[pathlib.Path, list[pathlib.Path]]:
+        """
+        Put everything the ``.tex`` file needs into the build directory,
+        and return the location of the document and the AASTeX files which
+        were copied there.
+
+        The arguments are described in :meth:`generate_pdf`.
+        """
+        if workers is not None and executor is not None:
+            raise ValueError("only one of `workers` and `executor` may be given")
+
+        if report is None:
+            report = BuildReport()
+
         if filepath is None:
             filepath = self.default_filepath
 
@@ -801,48 +2256,498 @@ class Document(pylatex.Document):
         directory = filepath.parent
         directory.mkdir(parents=True, exist_ok=True)
 
-        base = pathlib.Path(__file__).parent
-
-        copies = []
-        for name in ("aastex701.cls", "aasjournalv7.bst", "orcid-ID.png"):
-            destination = directory / name
-            if destination.exists():
-                continue
-            shutil.copyfile(base / name, destination)
-            copies.append(destination)
+        # Walk the document once, and keep the result for `generate_archive`,
+        # which needs the same images and bibliographies.
+        with report.stage("traversal"):
+            self._build_index = index = _index(self)
+        self._emit("traversal", total=len(index.images))
+
+        with report.stage("support") as stage:
+            copies = _copy_support_files(directory, incremental)
+            stage.bytes = sum(_report._size(c) for c in copies)
+
+        def on_write(timing: Timing, total: int) -> None:
+            report.images.append(timing)
+            self._emit(
+                "image",
+                name=timing.name,
+                index=len(report.images) - start,
+                total=total,
+                seconds=timing.wall,
+            )
 
-        seen = {}
-        for image in self.images:
-            other = seen.get(image.name)
-            if other is not None and not image.is_same_file(other):
-                raise ValueError(
-                    f"two different images are named {image.name!r}, which "
-                    f"usually means two figures share the label "
-                    f"{pathlib.Path(image.name).stem!r}"
+        start = len(report.images)
+        with report.stage("images") as stage, contextlib.ExitStack() as stack:
+            if text_only:
+                _write_placeholders(index.images, directory)
+            else:
+                if workers is not None:
+                    executor = concurrent.futures.ProcessPoolExecutor(workers)
+                    stack.enter_context(executor)
+                _write_images(
+                    index.images,
+                    directory,
+                    executor=executor,
+                    cache=cache,
+                    incremental=incremental,
+                    link=link,
+                    release=release,
+                    draft=self.draft,
+                    rasterize_threshold=rasterize_threshold,
+                    deduplicate=deduplicate,
+                    on_write=on_write,
                 )
-            seen[image.name] = image
-            image.write(directory)
+            filenames = dict.fromkeys(i.filename for i in index.images)
+            stage.bytes = sum(_report._size(directory / f) for f in filenames)
+
+        return filepath, copies
+
+    async def generate_pdf_async(
+        self,
+        filepath: None | str | pathlib.Path = None,
+        *,
+        clean: bool = True,
+        clean_tex: bool = True,
+        compiler: None | str = None,
+        compiler_args: None | list[str] = None,
+        silent: bool = True,
+        timeout: None | float = None,
+        **kwargs,
+    ) -> None:
+        """
+        Generate a pdf file from this document without blocking the event
+        loop, for use in an :mod:`asyncio` application.
+
+        The images are written on a separate thread, and the LaTeX compiler
+        runs as a subprocess of the event loop.
+        If the task running this method is cancelled, or the compiler takes
+        longer than ``timeout``, the compiler is killed and the AASTeX files
+        copied into the build directory are removed as usual.
+        Writing the images cannot be interrupted, so if the task is cancelled
+        before they are done, the thread writing them carries on until it
+        finishes, and removes the copied files itself.
+
+        Parameters
+        ----------
+        filepath
+            The name of the file (without the ``.pdf`` extension).
+            If :obj:`None`, :attr:`default_filepath` is used.
+        clean
+            Whether the non-pdf files created during compilation should be
+            removed.
+        clean_tex
+            Whether the generated tex file should be removed.
+        compiler
+            The name of the LaTeX compiler to use.
+            If :obj:`None`, ``latexmk`` and then ``pdflatex`` are tried.
+        compiler_args
+            Extra arguments to pass to the LaTeX compiler.
+        silent
+            Whether to hide the output of the compiler.
+        timeout
+            The longest time in seconds to let the compiler run before raising
+            :class:`TimeoutError`.
+            If :obj:`None`, the compiler may run for as long as it needs.
+        kwargs
+            Additional keyword arguments controlling how the images are
+            written, such as ``workers`` or ``cache``, as described in
+            :meth:`generate_pdf`.
+            The options ``format_cache``, ``include``, and ``include_only``
+            are not supported.
+        """
+        _reject_options("generate_pdf_async", kwargs)
+
+        loop = asyncio.get_running_loop()
+
+        # The copied files are known either when `prepare` finishes or when
+        # this coroutine stops, whichever is later, so both of them try to
+        # remove the files and the lock makes sure one of them does.
+        copies: list[pathlib.Path] = []
+        lock = threading.Lock()
+        finished = False
+
+        def remove_copies() -> None:
+            if clean_tex and not kwargs.get("incremental", False):
+                for destination in copies:
+                    destination.unlink(missing_ok=True)
+
+        def prepare() -> pathlib.Path:
+            filepath_, copies_ = self._prepare(filepath, **kwargs)
+            with lock:
+                copies.extend(copies_)
+                if finished:
+                    remove_copies()
+                    return filepath_
+            with self._writing(kwargs.get("report"), kwargs.get("text_only", False)):
+                self.generate_tex(str(filepath_.absolute()))
+            return filepath_
 
         try:
-            super().generate_pdf(
-                filepath=filepath,
-                clean=clean,
-                clean_tex=clean_tex,
-                compiler=compiler,
-                compiler_args=compiler_args,
-                silent=silent,
+            filepath = await loop.run_in_executor(None, prepare)
+            filepath = filepath.absolute()
+
+            report = kwargs.get("report")
+            passes = _report._PassTimer(
+                passes=[] if report is None else report.passes,
+                on_event=self.on_event,
             )
+
+            try:
+                await _compiler._compile(
+                    filepath=filepath,
+                    clean=clean,
+                    compiler=compiler,
+                    compiler_args=compiler_args,
+                    silent=silent,
+                    timeout=timeout,
+                    on_line=passes,
+                )
+                if clean_tex:
+                    filepath.with_name(f"{filepath.name}.tex").unlink()
+            finally:
+                passes.close()
         finally:
+            with lock:
+                finished = True
+                remove_copies()
+
+    def generate_variants(
+        self,
+        variants: dict[str, str | list[str]],
+        filepath: None | str | pathlib.Path = None,
+        *,
+        clean: bool = True,
+        clean_tex: bool = True,
+        compiler: None | str = None,
+        compiler_args: None | list[str] = None,
+        silent: bool = True,
+        jobs: None | int = None,
+        timeout: None | float = None,
+        **kwargs,
+    ) -> dict[str, Variant]:
+        """
+        Compile several variants of this document, which differ only in the
+        options passed to the AASTeX class, such as a copy for review with
+        line numbers and a final copy without.
+
+        The images are written once, into the directory of ``filepath``, and
+        then hard-linked into a separate build directory for each variant,
+        named after the variant, so that ``filepath="build/article"`` gives
+        ``build/review/article.pdf``, ``build/final/article.pdf``, and so on.
+        The variants are then compiled at the same time.
+
+        A variant which fails to compile does not stop the others,
+        so check :attr:`Variant.error` of each result.
+
+        Parameters
+        ----------
+        variants
+            The options passed to the AASTeX class for each variant,
+            keyed by the name of the variant.
+            These replace the options of this document, so a variant with line
+            numbers needs to include ``"linenumbers"``.
+        filepath
+            The name of the file (without the ``.pdf`` extension) in the
+            directory where the images are written.
+            If :obj:`None`, :attr:`default_filepath` is used.
+        clean
+            Whether the non-pdf files created during compilation should be
+            removed.
+        clean_tex
+            Whether the generated tex files should be removed.
+        compiler
+            The name of the LaTeX compiler to use.
+            If :obj:`None`, ``latexmk`` and then ``pdflatex`` are tried.
+        compiler_args
+            Extra arguments to pass to the LaTeX compiler.
+        silent
+            Whether to hide the output of the compiler.
+        jobs
+            The largest number of variants to compile at the same time.
+            If :obj:`None`, the number of CPUs is used.
+        timeout
+            The longest time in seconds to let the compiler run for each
+            variant before giving up on it.
+            If :obj:`None`, the compiler may run for as long as it needs.
+        kwargs
+            Additional keyword arguments controlling how the images are
+            written, such as ``workers`` or ``cache``, as described in
+            :meth:`generate_pdf`.
+            The options ``format_cache``, ``include``, and ``include_only``
+            are not supported.
+
+        Examples
+        --------
+
+        Compile a copy for review and a final copy of an article:
+
+        .. code-block:: python
+
+            results = doc.generate_variants(
+                variants=dict(
+                    review=["twocolumn", "linenumbers"],
+                    final=["twocolumn"],
+                ),
+                filepath="build/article",
+            )
+
+            for name, result in results.items():
+                print(f"{name} took {result.seconds:.1f} seconds")
+        """
+        _reject_options("generate_variants", kwargs)
+
+        if filepath is None:
+            filepath = self.default_filepath
+        filepath = pathlib.Path(filepath).absolute()
+
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+
+        incremental = kwargs.get("incremental", False)
+
+        filepath, copies = self._prepare(filepath, **kwargs)
+        directory = filepath.parent
+        filenames = dict.fromkeys(i.filename for i in self._build_index.images)
+
+        results = dict()
+        original = self.documentclass
+        # The lazy variables are computed once for all of the variants.
+        with self._writing(kwargs.get("report"), kwargs.get("text_only", False)):
+            try:
+                for name, options in variants.items():
+                    if isinstance(options, str):
+                        options = [options]
+                    options = list(options)
+
+                    variant = directory / name / filepath.name
+                    variant.parent.mkdir(parents=True, exist_ok=True)
+                    copies += _copy_support_files(variant.parent, incremental)
+                    for filename in filenames:
+                        _files._copy(
+                            source=directory / filename,
+                            destination=variant.parent / filename,
+                            incremental=incremental,
+                            link="hardlink",
+                        )
+
+                    # The `.tex` files are written one at a time, since writing
+                    # one changes the packages of this document.
+                    self.documentclass = pylatex.Command(
+                        command="documentclass",
+                        arguments=original.arguments,
+                        options=options,
+                    )
+                    self.generate_tex(str(variant))
+
+                    results[name] = Variant(
+                        name=name,
+                        filepath=variant,
+                        document_options=options,
+                    )
+            finally:
+                self.documentclass = original
+
+        async def compile(result: Variant, semaphore: asyncio.Semaphore) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await _compiler._compile(
+                        filepath=result.filepath,
+                        clean=clean,
+                        compiler=compiler,
+                        compiler_args=compiler_args,
+                        silent=silent,
+                        timeout=timeout,
+                    )
+                except Exception as e:
+                    _log.warning(f"variant {result.name!r} failed to compile: {e}")
+                    result.error = e
+                finally:
+                    result.seconds = time.perf_counter() - start
             if clean_tex:
+                tex = result.filepath.with_name(f"{result.filepath.name}.tex")
+                tex.unlink(missing_ok=True)
+
+        async def main() -> None:
+            semaphore = asyncio.Semaphore(jobs)
+            await asyncio.gather(*[compile(r, semaphore) for r in results.values()])
+
+        try:
+            _compiler._synchronously(main())
+        finally:
+            if clean_tex and not incremental:
                 for destination in copies:
                     destination.unlink(missing_ok=True)
 
+        return results
+
+    def watch(
+        self,
+        filepath: None | str | pathlib.Path = None,
+        *,
+        rebuild: None | Callable[[], "Document"] = None,
+        paths: Iterable[str | pathlib.Path] = (),
+        bibliography: None | str | pathlib.Path = None,
+        interval: float = 1,
+        builds: None | int = None,
+        cache: None | RenderCache = None,
+        **kwargs,
+    ) -> "Document":
+        """
+        Compile this document, and compile it again whenever its inputs
+        change, until interrupted.
+
+        The inputs are the existing image files of the document, its
+        ``.bib`` files, and any other ``paths``, such as the script which
+        creates the document or the data it plots.
+        When one of ``paths`` changes, ``rebuild`` is called to create the
+        document again, and the new document is compiled and watched
+        instead.
+
+        Each build is incremental, so figures which have not changed since
+        the previous build are taken from ``cache`` rather than saved again,
+        and only the image files whose contents changed are written, which
+        keeps the compiler from seeing the others change.
+        The auxiliary files of the compiler are kept between builds, so that
+        ``latexmk`` only reruns BibTeX if the citations or the ``.bib`` files
+        changed, and only runs as many passes as the changes need.
+        A build which fails is logged, and the inputs are watched for a fix.
+        So is a call to ``rebuild`` which fails, such as when the script is
+        saved halfway through an edit, and the previous document is kept
+        until ``rebuild`` succeeds.
+
+        Parameters
+        ----------
+        filepath
+            The name of the file (without the ``.pdf`` extension).
+            If :obj:`None`, :attr:`default_filepath` is used.
+        rebuild
+            An optional function without arguments which creates the
+            document again after one of ``paths`` changed.
+        paths
+            Additional files to watch, which need ``rebuild`` to take effect.
+        bibliography
+            The location of a ``.bib`` file to watch, in addition to those
+            found next to the document.
+        interval
+            The number of seconds between checks for changes.
+        builds
+            The largest number of builds before returning.
+            If :obj:`None`, this continues until interrupted, such as by
+            pressing :kbd:`Ctrl+C`.
+        cache
+            A cache of previously saved figures.
+            If :obj:`None`, a temporary cache is used for as long as this
+            runs.
+        kwargs
+            Additional keyword arguments passed to :meth:`generate_pdf`,
+            other than ``clean``, ``clean_tex``, and ``incremental``, which
+            are always :obj:`False`, :obj:`False`, and :obj:`True`.
+
+        Returns
+        -------
+        The document which was compiled last, which is a different document
+        from this one if it was rebuilt.
+
+        Examples
+        --------
+
+        Recompile an article whenever the script which writes it is saved:
+
+        .. code-block:: python
+
+            def article() -> aastex.Document:
+                ...
+
+            article().watch("build/article", rebuild=article, paths=[__file__])
+        """
+        fixed = {"clean", "clean_tex", "incremental"} & kwargs.keys()
+        if fixed:
+            raise TypeError(
+                f"watch() cannot be given {', '.join(sorted(fixed))}, since every "
+                f"build keeps its files for the next one"
+            )
+
+        if filepath is None:
+            filepath = self.default_filepath
+        filepath = pathlib.Path(filepath)
+
+        paths = [pathlib.Path(path) for path in paths]
+        bibliographies = []
+        if bibliography is not None:
+            bibliographies.append(pathlib.Path(bibliography))
+
+        document = self
+        count = 0
+
+        with contextlib.ExitStack() as stack:
+            if cache is None:
+                cache = RenderCache(stack.enter_context(tempfile.TemporaryDirectory()))
+
+            while True:
+                try:
+                    document.generate_pdf(
+                        filepath=filepath,
+                        clean=False,
+                        clean_tex=False,
+                        incremental=True,
+                        cache=cache,
+                        **kwargs,
+                    )
+                except Exception as e:
+                    _log.error(f"failed to build {str(filepath)!r}: {e}")
+                else:
+                    _log.info(f"built {str(filepath)!r}")
+
+                count += 1
+                if builds is not None and count >= builds:
+                    return document
+
+                # Wait for a change, and if the document cannot be rebuilt
+                # after it, for the next one, which may fix it.
+                while True:
+                    inputs = document._inputs(filepath.parent) + bibliographies
+                    before = _files._snapshot(inputs + paths)
+                    try:
+                        while True:
+                            time.sleep(interval)
+                            after = _files._snapshot(inputs + paths)
+                            if after != before:
+                                break
+                    except KeyboardInterrupt:
+                        return document
+
+                    changed = [path for path in paths if before[path] != after[path]]
+                    if not changed or rebuild is None:
+                        break
+
+                    _log.info(f"rebuilding, since {str(changed[0])!r} changed")
+                    try:
+                        document = rebuild()
+                    except Exception as e:
+                        _log.error(f"failed to rebuild the document: {e}")
+                    else:
+                        break
+
+    def _inputs(self, directory: pathlib.Path) -> list[pathlib.Path]:
+        """
+        The files outside of this document which it is compiled from, which
+        are its existing images and the ``.bib`` files in ``directory``.
+        """
+        index = _index(self)
+        result = [image.source for image in index.images if image.source is not None]
+        for bibliography in index.bibliographies:
+            for name in bibliography.sources.split(","):
+                result.append(directory / f"{name.strip()}.bib")
+        return result
+
     def generate_archive(
         self,
         filepath: None | str | pathlib.Path = None,
         *,
         format: str = "zip",
         bibliography: None | str | pathlib.Path = None,
+        report: None | BuildReport = None,
         **kwargs,
     ) -> pathlib.Path:
         """
@@ -866,6 +2771,9 @@ class Document(pylatex.Document):
         bibliography
             The location of the ``.bib`` file to include in the archive.
             If :obj:`None`, no ``.bib`` file is included.
+        report
+            An optional report to fill in with how long each stage of the
+            build took, including writing the archive.
         kwargs
             Additional keyword arguments passed to :meth:`generate_pdf`.
         """
@@ -878,6 +2786,7 @@ class Document(pylatex.Document):
             filepath=filepath,
             clean=False,
             clean_tex=False,
+            report=report,
             **kwargs,
         )
 
@@ -889,14 +2798,17 @@ class Document(pylatex.Document):
             directory / "aasjournalv7.bst",
             directory / "orcid-ID.png",
         ]
+        members += self._build_includes
+
+        index = self._build_index
 
-        members += [directory / image.name for image in self.images]
+        filenames = dict.fromkeys(image.filename for image in index.images)
+        members += [directory / filename for filename in filenames]
 
         # The AAS conversion software requires the .bbl file, so it is only
         # optional for a document without a bibliography.
         bbl = filepath.with_suffix(".bbl")
-        cited = any(isinstance(d, Bibliography) for d in _descendants(self))
-        if cited or bbl.exists():
+        if index.bibliographies or bbl.exists():
             members.append(bbl)
 
         if bibliography is not None:
@@ -909,18 +2821,40 @@ class Document(pylatex.Document):
                 f"this document but were not found"
             )
 
-        if format == "zip":
-            result = filepath.with_suffix(".zip")
-            with zipfile.ZipFile(result, "w", zipfile.ZIP_DEFLATED) as archive:
-                for member in members:
-                    archive.write(member, arcname=member.name)
-        elif format == "gztar":
-            result = filepath.with_suffix(".tar.gz")
-            with tarfile.open(result, "w:gz") as archive:
-                for member in members:
-                    archive.add(member, arcname=member.name)
-        else:
-            raise ValueError(f"unrecognized format {format!r}")
+        stage = contextlib.nullcontext()
+        if report is not None:
+            stage = report.stage("archive")
+
+        with stage as timing:
+            if format == "zip":
+                result = filepath.with_suffix(".zip")
+                with zipfile.ZipFile(result, "w", zipfile.ZIP_DEFLATED) as archive:
+                    for i, member in enumerate(members):
+                        archive.write(member, arcname=member.name)
+                        self._emit(
+                            "archive_member",
+                            name=member.name,
+                            index=i + 1,
+                            total=len(members),
+                        )
+            elif format == "gztar":
+                result = filepath.with_suffix(".tar.gz")
+                # Follow symbolic links, since images may have been linked into
+                # the build directory rather than copied.
+                with tarfile.open(result, "w:gz", dereference=True) as archive:
+                    for i, member in enumerate(members):
+                        archive.add(member, arcname=member.name)
+                        self._emit(
+                            "archive_member",
+                            name=member.name,
+                            index=i + 1,
+                            total=len(members),
+                        )
+            else:
+                raise ValueError(f"unrecognized format {format!r}")
+
+            if report is not None:
+                timing.bytes = _report._size(result)
 
         return result
 
@@ -933,3 +2867,4 @@ class Bibliography(pylatex.base_classes.CommandBase):
         super().__init__(
             arguments=sources,
         )
+        self.sources = sources
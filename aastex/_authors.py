@@ -0,0 +1,253 @@
+import csv
+import pathlib
+from collections.abc import Iterable, Iterator, Mapping
+
+import numpy as np
+import astropy.table
+import pylatex
+from pylatex.utils import escape_latex
+from ._aastex import Affiliation, Author
+
+__all__ = [
+    "AuthorList",
+]
+
+
+def _missing(value) -> bool:
+    """Whether a cell of a table is empty."""
+    return value is None or value is np.ma.masked or str(value).strip() == ""
+
+
+def _truthy(value) -> bool:
+    """Whether a cell of a table means yes."""
+    if _missing(value):
+        return False
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
+
+
+class AuthorList(pylatex.base_classes.LatexObject):
+    """
+    The authors of an article with a large collaboration, written in the same
+    way as a list of :class:`Author` objects, but stored compactly.
+
+    Each attribute of the authors is stored as a column, instead of as an
+    object for each author, and each distinct affiliation is only stored
+    once, no matter how many authors share it.
+    The text of all the authors is written at once, and is identical to
+    appending each :class:`Author` to the document separately.
+
+    Parameters
+    ----------
+    authors
+        The authors to start with.
+
+    Examples
+    --------
+
+    Load the authors of an article from a CSV file with the columns ``name``,
+    ``affiliation``, ``email``, ``orcid``, and so on:
+
+    .. code-block:: python
+
+        authors = aastex.AuthorList.read("authors.csv")
+
+        doc.append(authors)
+    """
+
+    def __init__(self, authors: Iterable[Author] = ()):
+        super().__init__()
+        self._names = []
+        self._affiliation_indices = []
+        self._altaffiliations = []
+        self._emails = []
+        self._orcids = []
+        self._corresponding = []
+        self._affiliations = []
+        self._interned = {}
+        self.extend(authors)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, index: int) -> Author:
+        affiliations = [self._affiliations[i] for i in self._affiliation_indices[index]]
+        if len(affiliations) == 1:
+            affiliations = affiliations[0]
+        return Author(
+            name=self._names[index],
+            affiliation=affiliations,
+            altaffiliation=self._altaffiliations[index],
+            email=self._emails[index],
+            orcid=self._orcids[index],
+            corresponding=self._corresponding[index],
+        )
+
+    def __iter__(self) -> Iterator[Author]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def affiliations(self) -> list[Affiliation]:
+        """Every distinct affiliation of the authors, in order of appearance."""
+        return list(self._affiliations)
+
+    def _intern(self, affiliation: Affiliation) -> int:
+        """
+        The index of ``affiliation`` in :attr:`affiliations`, which is added
+        unless an affiliation with the same text is already there.
+        """
+        key = affiliation.dumps()
+        try:
+            return self._interned[key]
+        except KeyError:
+            self._affiliations.append(affiliation)
+            result = self._interned[key] = len(self._affiliations) - 1
+            return result
+
+    def append(self, author: Author) -> None:
+        """
+        Add an author to the end of this list.
+
+        Parameters
+        ----------
+        author
+            The author to add.
+        """
+        self._names.append(author.name)
+        self._affiliation_indices.append(
+            tuple(self._intern(a) for a in author.affiliations)
+        )
+        self._altaffiliations.append(author.altaffiliation)
+        self._emails.append(author.email)
+        self._orcids.append(author.orcid)
+        self._corresponding.append(author.corresponding)
+
+    def extend(self, authors: Iterable[Author]) -> None:
+        """
+        Add several authors to the end of this list.
+
+        Parameters
+        ----------
+        authors
+            The authors to add.
+        """
+        for author in authors:
+            self.append(author)
+
+    @classmethod
+    def from_table(
+        cls,
+        table: astropy.table.Table | Iterable[Mapping],
+        separator: str = ";",
+    ) -> "AuthorList":
+        """
+        Load the authors from a table with one row per author, and a column
+        for each attribute of :class:`Author` which is used.
+
+        The ``name`` and ``affiliation`` columns are required.
+
+        Parameters
+        ----------
+        table
+            The table of authors, either an :class:`astropy.table.Table` or
+            any sequence of rows which map the names of the columns to
+            values, such as the rows of :class:`csv.DictReader`.
+        separator
+            The character which separates the affiliations of an author with
+            more than one.
+            Empty cells are treated as if the attribute was not given.
+        """
+        result = cls()
+        affiliations = {}
+
+        for row in table:
+            keys = row.keys() if isinstance(row, Mapping) else row.colnames
+
+            def get(key: str):
+                if key not in keys or _missing(row[key]):
+                    return None
+                return str(row[key])
+
+            names = get("affiliation") or ""
+            indices = []
+            for name in names.split(separator):
+                name = name.strip()
+                if not name:
+                    continue
+                if name not in affiliations:
+                    affiliations[name] = result._intern(Affiliation(name))
+                indices.append(affiliations[name])
+
+            result._names.append(get("name"))
+            result._affiliation_indices.append(tuple(indices))
+            result._altaffiliations.append(get("altaffiliation"))
+            result._emails.append(get("email"))
+            result._orcids.append(get("orcid"))
+            result._corresponding.append(
+                "corresponding" in keys and _truthy(row["corresponding"])
+            )
+
+        return result
+
+    @classmethod
+    def read(
+        cls,
+        path: str | pathlib.Path,
+        separator: str = ";",
+    ) -> "AuthorList":
+        """
+        Load the authors from a CSV file with a header, as described in
+        :meth:`from_table`.
+
+        Parameters
+        ----------
+        path
+            The location of the CSV file.
+        separator
+            The character which separates the affiliations of an author with
+            more than one.
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls.from_table(csv.DictReader(f), separator=separator)
+
+    def dumps(self) -> str:
+        # This is the same text as `Author.dumps`, without creating any
+        # commands, and with the text of each affiliation only written once.
+        affiliations = [a.dumps() for a in self._affiliations]
+
+        result = []
+        for i, name in enumerate(self._names):
+            if i:
+                result.append("%\n")
+
+            name = escape_latex(name)
+
+            email = self._emails[i]
+            email = "" if email is None else escape_latex(email)
+
+            if self._corresponding[i]:
+                result.append(f"\\correspondingauthor{{{name}}}\n")
+                email = f"\\email[show]{{{email}}}"
+            else:
+                email = f"\\email{{{email}}}"
+
+            orcid = self._orcids[i]
+            if orcid is not None:
+                result.append(f"\\author[{orcid}]{{{name}}}\n")
+            else:
+                result.append(f"\\author{{{name}}}\n")
+
+            altaffiliation = self._altaffiliations[i]
+            if altaffiliation is not None:
+                altaffiliation = escape_latex(altaffiliation)
+                result.append(f"\\altaffiliation{{{altaffiliation}}}\n")
+
+            result.append(email)
+            result.append("\n")
+            result.append(
+                "\n".join(affiliations[j] for j in self._affiliation_indices[i])
+            )
+
+        return "".join(result)
@@ -0,0 +1,338 @@
+import dataclasses
+import functools
+import hashlib
+import os
+import pathlib
+import pickle
+import shutil
+import subprocess
+import tempfile
+
+import matplotlib
+import matplotlib.artist
+import matplotlib.cbook
+import matplotlib.figure
+import matplotlib.transforms
+
+__all__ = [
+    "RenderCache",
+    "FormatCache",
+]
+
+_volatile = {
+    matplotlib.transforms.TransformNode: ("_parents", "_invalid"),
+    matplotlib.artist.Artist: ("stale", "_stale_viewlims", "_number"),
+    matplotlib.cbook.CallbackRegistry: ("_cid_gen",),
+}
+"""
+Bookkeeping attributes which do not change what a figure looks like, but which
+do change between two otherwise identical figures, such as the memory
+addresses of the parents of a transform or the number :mod:`matplotlib.pyplot`
+assigned to a figure.
+"""
+
+
+class _Pickler(pickle.Pickler):
+    """
+    A pickler which leaves out the bookkeeping attributes in :data:`_volatile`,
+    so that identical figures pickle to identical bytes.
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, type):
+            return NotImplemented
+        for cls, names in _volatile.items():
+            if isinstance(obj, cls):
+                reduced = obj.__reduce_ex__(5)
+                state = reduced[2]
+                if isinstance(state, dict):
+                    state = {k: v for k, v in state.items() if k not in names}
+                return reduced[:2] + (state,) + reduced[3:]
+        return NotImplemented
+
+
+class _Hash:
+    """A file-like wrapper which feeds everything written to it into a hash."""
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.hash.update(data)
+        return len(data)
+
+
+def _figure_key(
+    figure: matplotlib.figure.Figure,
+    args: tuple,
+    kwargs: dict,
+    suffix: str,
+) -> str:
+    """
+    A stable hash of everything which determines the file saved by
+    :meth:`matplotlib.figure.Figure.savefig`.
+
+    The hash is stable between processes, so the same script run twice gives
+    the same key, but a figure which has already been drawn hashes differently
+    from one which has not, since drawing fills in caches on the figure.
+    :class:`Image` remembers the key of a figure from before it was saved,
+    so that saving it again unchanged still finds it in the cache.
+    """
+    rc = {k: v for k, v in matplotlib.rcParams.items() if k != "backend"}
+    result = _Hash()
+    _Pickler(result, protocol=5).dump((figure, args, kwargs, suffix, rc))
+    return result.hash.hexdigest()
+
+
+@dataclasses.dataclass
+class RenderCache:
+    """
+    A persistent cache of the files saved from :mod:`matplotlib` figures,
+    so that a figure which has not changed since the last build is copied
+    into the build directory instead of saved again.
+
+    Entries are keyed by a hash of the figure and the arguments to
+    :meth:`matplotlib.figure.Figure.savefig`, and the least recently used
+    entries are removed once the cache grows beyond :attr:`max_bytes`.
+
+    Examples
+    --------
+
+    Reuse the figures of the previous build of an article:
+
+    .. code-block:: python
+
+        cache = aastex.RenderCache(pathlib.Path.home() / ".cache" / "article")
+
+        doc.generate_pdf("article", cache=cache)
+
+        print(f"{cache.hits} figures reused, {cache.misses} figures saved")
+    """
+
+    directory: pathlib.Path
+    """The directory where the saved figures are kept."""
+
+    max_bytes: int = 2**30
+    """The largest total size of the cache before old entries are removed."""
+
+    hits: int = dataclasses.field(default=0, init=False)
+    """The number of figures which were found in the cache."""
+
+    misses: int = dataclasses.field(default=0, init=False)
+    """The number of figures which had to be saved."""
+
+    def __post_init__(self):
+        self.directory = pathlib.Path(self.directory)
+
+    def _path(self, key: str, suffix: str) -> pathlib.Path:
+        return self.directory / f"{key}{suffix}"
+
+    def fetch(self, key: str, destination: pathlib.Path) -> bool:
+        """
+        Copy the entry for ``key`` to ``destination``, if there is one.
+
+        Parameters
+        ----------
+        key
+            The key of the entry.
+        destination
+            Where to copy the entry to.
+        """
+        path = self._path(key, destination.suffix)
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        os.utime(path)
+        self.hits += 1
+        return True
+
+    def store(self, key: str, source: pathlib.Path) -> None:
+        """
+        Add a copy of ``source`` to the cache as the entry for ``key``, and
+        remove the least recently used entries if the cache is now too large.
+
+        Parameters
+        ----------
+        key
+            The key of the entry.
+        source
+            The file to store.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Copy to a temporary name first so that another process reading the
+        # cache never sees a partially written entry.
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(source, temporary)
+        os.replace(temporary, self._path(key, source.suffix))
+
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache is no larger
+        than :attr:`max_bytes`.
+        """
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+@functools.cache
+def _engine_version(engine: str) -> str:
+    """
+    The version of the TeX engine ``engine``, which is part of the key of a
+    format since a format can only be loaded by the engine which dumped it.
+    """
+    try:
+        output = subprocess.run(
+            [engine, "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ).stdout
+    except OSError:
+        return ""
+    return output.decode(errors="replace").partition("\n")[0]
+
+
+@dataclasses.dataclass
+class FormatCache:
+    """
+    A persistent cache of precompiled preambles, so that LaTeX does not need
+    to read the AASTeX class and every package on each pass of each compile.
+
+    The document class, its options, and the packages of a document are
+    dumped into a format file using
+    `mylatexformat <https://ctan.org/pkg/mylatexformat>`_,
+    which is keyed by a hash of that part of the preamble, the AASTeX class,
+    and the version of pdfTeX,
+    and each later compile of a document with the same preamble loads the
+    format instead.
+    Everything after the packages, such as the variables of the document,
+    is still read on every pass, so changing a variable does not require a
+    new format.
+
+    This only applies to pdfLaTeX, which is what ``latexmk`` uses to
+    compile the document if no other compiler is given.
+
+    Examples
+    --------
+
+    Reuse the preamble of the previous build of an article:
+
+    .. code-block:: python
+
+        formats = aastex.FormatCache(pathlib.Path.home() / ".cache" / "formats")
+
+        doc.generate_pdf("article", format_cache=formats)
+    """
+
+    directory: pathlib.Path
+    """The directory where the format files are kept."""
+
+    engine: str = "pdftex"
+    """The TeX engine used to dump the format files."""
+
+    hits: int = dataclasses.field(default=0, init=False)
+    """The number of preambles which were found in the cache."""
+
+    misses: int = dataclasses.field(default=0, init=False)
+    """The number of preambles which had to be dumped."""
+
+    def __post_init__(self):
+        self.directory = pathlib.Path(self.directory)
+
+    def key(self, preamble: str) -> str:
+        """
+        The key of the format file for ``preamble``.
+
+        Parameters
+        ----------
+        preamble
+            The part of a ``.tex`` file which is dumped into the format.
+        """
+        result = hashlib.sha256()
+        result.update(_engine_version(self.engine).encode())
+        result.update((pathlib.Path(__file__).parent / "aastex701.cls").read_bytes())
+        result.update(preamble.encode())
+        return result.hexdigest()
+
+    def path(self, key: str) -> pathlib.Path:
+        """
+        The location of the format file for ``key``.
+
+        Parameters
+        ----------
+        key
+            The key of the format file.
+        """
+        return self.directory / f"{key}.fmt"
+
+    def build(self, key: str, preamble: str) -> None:
+        """
+        Dump ``preamble`` into the format file for ``key``, unless it is
+        already in the cache.
+
+        Parameters
+        ----------
+        key
+            The key of the format file.
+        preamble
+            The part of a ``.tex`` file to dump into the format.
+            It is dumped in a temporary directory, along with copies of the
+            AASTeX class and bibliography style, so it cannot need any other
+            files from the build directory.
+        """
+        path = self.path(key)
+        if path.exists():
+            os.utime(path)
+            self.hits += 1
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Dump the format under a temporary name, so that another process
+        # reading the cache never sees a partially written format.
+        with tempfile.TemporaryDirectory(dir=self.directory) as tmp:
+            tmp = pathlib.Path(tmp)
+            for name in ("aastex701.cls", "aasjournalv7.bst"):
+                shutil.copyfile(pathlib.Path(__file__).parent / name, tmp / name)
+            (tmp / "preamble.tex").write_text(
+                preamble + "\\begin{document}\n\\end{document}\n"
+            )
+            subprocess.run(
+                [
+                    self.engine,
+                    "-ini",
+                    "-interaction=nonstopmode",
+                    f"-jobname={key}",
+                    "&pdflatex",
+                    "mylatexformat.ltx",
+                    "preamble.tex",
+                ],
+                cwd=tmp,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                check=True,
+            )
+            os.replace(tmp / f"{key}.fmt", path)
+
+        self.misses += 1
@@ -0,0 +1,178 @@
+import asyncio
+import concurrent.futures
+import os
+import pathlib
+import signal
+import subprocess
+from collections.abc import Awaitable, Callable
+
+import pylatex.errors
+import pylatex.utils
+
+__all__ = []
+
+_clean_extensions = ("aux", "log", "out", "fls", "fdb_latexmk")
+"""
+The auxiliary files removed after compiling if ``latexmk`` is not available to
+clean up after itself.
+"""
+
+
+def _commands(
+    filepath: pathlib.Path,
+    compiler: None | str,
+    compiler_args: None | list[str],
+) -> list[list[str]]:
+    """
+    The commands to try, in order, to compile the ``.tex`` file at
+    ``filepath``.
+
+    These match the commands used by :meth:`pylatex.Document.generate_pdf`,
+    which tries ``latexmk`` and then ``pdflatex`` if no compiler is given.
+    """
+    if compiler_args is None:
+        compiler_args = []
+
+    if compiler is not None:
+        compilers = [[compiler]]
+    else:
+        compilers = [["latexmk", "--pdf"], ["pdflatex"]]
+
+    main = ["--interaction=nonstopmode", f"{filepath}.tex"]
+
+    return [c + compiler_args + main for c in compilers]
+
+
+async def _run(
+    command: list[str],
+    cwd: pathlib.Path,
+    timeout: None | float = None,
+    on_line: None | Callable[[str], None] = None,
+) -> bytes:
+    """
+    Run ``command`` without blocking the event loop, and return its output.
+
+    The process is killed if it takes longer than ``timeout`` seconds, or if
+    the task running it is cancelled, along with any processes it started,
+    such as the ``pdflatex`` and ``bibtex`` run by ``latexmk``.
+    If ``on_line`` is given, it is called with each line of the output as soon
+    as it is printed.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        limit=2**20,
+        # A session of its own makes the process the leader of a new process
+        # group, so that it can be killed along with everything it started.
+        start_new_session=os.name == "posix",
+    )
+
+    async def read() -> bytes:
+        lines = []
+        async for line in process.stdout:
+            lines.append(line)
+            if on_line is not None:
+                on_line(line.decode(errors="replace"))
+        await process.wait()
+        return b"".join(lines)
+
+    try:
+        output = await asyncio.wait_for(read(), timeout)
+    except BaseException as e:
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        # `asyncio.TimeoutError` is only the builtin `TimeoutError` on
+        # Python 3.11 and later.
+        if isinstance(e, asyncio.TimeoutError):
+            raise TimeoutError(
+                f"{command[0]!r} did not finish within {timeout} seconds"
+            ) from e
+        raise
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, output)
+
+    return output
+
+
+async def _clean(filepath: pathlib.Path) -> None:
+    """
+    Remove the auxiliary files left behind by compiling ``filepath``.
+    """
+    try:
+        await _run(["latexmk", "-c", str(filepath)], cwd=filepath.parent)
+    except (OSError, subprocess.CalledProcessError):
+        for extension in _clean_extensions:
+            filepath.with_name(f"{filepath.name}.{extension}").unlink(missing_ok=True)
+    pylatex.utils.rm_temp_dir()
+
+
+async def _compile(
+    filepath: pathlib.Path,
+    *,
+    clean: bool = True,
+    compiler: None | str = None,
+    compiler_args: None | list[str] = None,
+    silent: bool = True,
+    timeout: None | float = None,
+    on_line: None | Callable[[str], None] = None,
+) -> list[str]:
+    """
+    Compile the ``.tex`` file at ``filepath``, which is given without its
+    extension, in the same way as :meth:`pylatex.Document.generate_pdf` but
+    without blocking the event loop, and return the command which did so.
+
+    If ``on_line`` is given, it is called with each line of the output of the
+    compiler as soon as it is printed.
+    """
+    for command in _commands(filepath, compiler, compiler_args):
+        try:
+            output = await _run(
+                command,
+                cwd=filepath.parent,
+                timeout=timeout,
+                on_line=on_line,
+            )
+        except FileNotFoundError:
+            # If the compiler does not exist, try the next one.
+            continue
+        except subprocess.CalledProcessError as e:
+            print(e.output.decode())
+            raise
+
+        if not silent:
+            print(output.decode())
+
+        if clean:
+            await _clean(filepath)
+
+        return command
+
+    raise pylatex.errors.CompilerError(
+        "No LaTex compiler was found\n"
+        "Either specify a LaTex compiler "
+        "or make sure you have latexmk or pdfLaTex installed."
+    )
+
+
+def _synchronously(awaitable: Awaitable):
+    """
+    Wait for ``awaitable`` from synchronous code and return its result.
+
+    It runs on a new event loop in another thread, so that this works even
+    if the caller is itself running inside an event loop, as in a notebook.
+    """
+
+    async def main():
+        return await awaitable
+
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, main()).result()
@@ -0,0 +1,209 @@
+import contextlib
+import os
+import pathlib
+import re
+from collections.abc import Iterator
+
+import numpy as np
+import matplotlib
+import matplotlib.artist
+import matplotlib.collections
+import matplotlib.figure
+import matplotlib.lines
+import matplotlib.patches
+import PIL.Image
+
+__all__ = []
+
+_vector_suffixes = (".pdf", ".eps", ".ps", ".svg", ".pgf")
+"""The file types which store plots as vector graphics."""
+
+_draft_dpi = 72
+"""The resolution of figures saved for a draft of a document."""
+
+_draft_threshold = 10_000
+"""
+The number of points an artist must have to be rasterized when a vector
+figure is saved for a draft of a document.
+"""
+
+
+_fixed_metadata = {
+    ".pdf": {"CreationDate": None},
+    ".svg": {"Date": None},
+}
+"""
+The metadata which leaves out the date :mod:`matplotlib` would otherwise
+write into files of each type.
+"""
+
+
+@contextlib.contextmanager
+def _source_date_epoch() -> Iterator[None]:
+    """
+    Have :mod:`matplotlib` write a fixed date into PostScript files until the
+    end of the ``with`` statement, unless ``SOURCE_DATE_EPOCH`` is already set.
+
+    Another thread which saves a PostScript file at the same time may still
+    write the current date, which only makes its file differ from the last
+    build.
+    """
+    if "SOURCE_DATE_EPOCH" in os.environ:
+        yield
+        return
+    os.environ["SOURCE_DATE_EPOCH"] = "0"
+    try:
+        yield
+    finally:
+        os.environ.pop("SOURCE_DATE_EPOCH", None)
+
+
+def _savefig(
+    figure: matplotlib.figure.Figure,
+    destination: pathlib.Path,
+    *args,
+    **kwargs,
+) -> None:
+    """
+    Save ``figure`` to ``destination`` like
+    :meth:`matplotlib.figure.Figure.savefig`, but so that the same figure
+    always gives the same bytes, which is what lets an incremental build leave
+    the file alone and lets identical images be deduplicated.
+
+    The dates written into vector graphics are fixed, the ids in SVG files are
+    not random, and the name of the file is not written into PostScript files.
+    """
+    suffix = destination.suffix
+    metadata = _fixed_metadata.get(suffix)
+    if metadata is not None:
+        kwargs["metadata"] = metadata | (kwargs.get("metadata") or {})
+
+    with contextlib.ExitStack() as stack:
+        if suffix == ".svg" and matplotlib.rcParams["svg.hashsalt"] is None:
+            stack.enter_context(matplotlib.rc_context({"svg.hashsalt": "aastex"}))
+        if suffix in (".ps", ".eps"):
+            stack.enter_context(_source_date_epoch())
+            kwargs.setdefault("format", suffix[1:])
+            destination = stack.enter_context(open(destination, "wb"))
+        figure.savefig(destination, *args, **kwargs)
+
+
+def _points(artist: matplotlib.artist.Artist) -> int:
+    """
+    The number of points an artist draws, which is roughly proportional to
+    the size it contributes to a vector graphics file.
+    """
+    if isinstance(artist, matplotlib.lines.Line2D):
+        return int(np.size(artist.get_xdata()))
+    if isinstance(artist, matplotlib.collections.Collection):
+        offsets = len(artist.get_offsets())
+        vertices = sum(len(path.vertices) for path in artist.get_paths())
+        return max(offsets, vertices)
+    if isinstance(artist, matplotlib.patches.Patch):
+        return len(artist.get_path().vertices)
+    return 0
+
+
+def _heavy_artists(
+    figure: matplotlib.figure.Figure,
+    threshold: int,
+) -> list[matplotlib.artist.Artist]:
+    """
+    The artists in the axes of ``figure`` which draw at least ``threshold``
+    points.
+
+    Only the contents of each axes are considered, so that the labels, ticks,
+    and spines stay vector graphics even if the data does not.
+    """
+    result = []
+    for axes in figure.get_axes():
+        for artist in axes.get_children():
+            if _points(artist) >= threshold:
+                result.append(artist)
+    return result
+
+
+@contextlib.contextmanager
+def _rasterized(artists: list[matplotlib.artist.Artist]) -> Iterator[None]:
+    """
+    Temporarily rasterize ``artists``, so that saving a figure does not change
+    it permanently.
+    """
+    original = [artist.get_rasterized() for artist in artists]
+    for artist in artists:
+        artist.set_rasterized(True)
+    try:
+        yield
+    finally:
+        for artist, rasterized in zip(artists, original):
+            artist.set_rasterized(rasterized)
+
+
+_box = rb"\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)"
+"""The four numbers of a box in points, as in a PDF or PostScript file."""
+
+
+def _size(path: pathlib.Path) -> None | tuple[float, float]:
+    """
+    The width and height in inches at which the graphics package would draw
+    the image at ``path``, or :obj:`None` if it is not known.
+
+    This is the ``MediaBox`` of the first page of a PDF file, the bounding box
+    of a PostScript file, and the size in pixels of any other image, at the
+    resolution stored in it or else 72 pixels per inch, which is read from
+    the header without decoding the pixels.
+    """
+    try:
+        if path.suffix == ".pdf":
+            match = re.search(rb"/MediaBox\s*\[" + _box, path.read_bytes())
+        elif path.suffix in (".eps", ".ps"):
+            with open(path, "rb") as f:
+                match = re.search(rb"%%BoundingBox:" + _box, f.read(4096))
+        else:
+            with PIL.Image.open(path) as image:
+                dpi_x, dpi_y = image.info.get("dpi") or (72, 72)
+                width, height = image.size
+            return width / (dpi_x or 72), height / (dpi_y or 72)
+    except (OSError, ValueError, PIL.UnidentifiedImageError):
+        return None
+
+    if match is None:
+        return None
+    left, bottom, right, top = (float(x) for x in match.groups())
+    return (right - left) / 72, (top - bottom) / 72
+
+
+def _placeholder(path: pathlib.Path, width: float, height: float) -> None:
+    """
+    Write a blank PDF page ``width`` by ``height`` inches to ``path``, unless
+    it is already there, to stand in for an image in a text-only build.
+
+    This is only the few hundred bytes the graphics package needs to find the
+    size of the image, so it can draw an empty box in its place.
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /Resources << >> "
+        f"/MediaBox [0 0 {72 * width:.2f} {72 * height:.2f}] >>",
+    ]
+
+    result = "%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(result))
+        result += f"{i} 0 obj\n{obj}\nendobj\n"
+
+    start = len(result)
+    result += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    for offset in offsets:
+        result += f"{offset:010d} 00000 n \n"
+    result += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+    result += f"startxref\n{start}\n%%EOF\n"
+
+    try:
+        if path.read_text() == result:
+            return
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    path.write_text(result)
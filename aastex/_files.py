@@ -0,0 +1,159 @@
+import hashlib
+import os
+import pathlib
+import shutil
+from collections.abc import Iterable
+
+__all__ = []
+
+
+def _digest(path: pathlib.Path) -> str:
+    """
+    A hash of the contents of the file at ``path``.
+    """
+    result = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            result.update(chunk)
+    return result.hexdigest()
+
+
+def _up_to_date(source: pathlib.Path, destination: pathlib.Path) -> bool:
+    """
+    Whether ``destination`` already has the same contents as ``source``.
+
+    The sizes and modification times are compared first, so that the contents
+    only need to be read if the sizes match but the times do not.
+    """
+    try:
+        d = destination.stat()
+    except FileNotFoundError:
+        return False
+    s = source.stat()
+    if s.st_size != d.st_size:
+        return False
+    if s.st_mtime_ns == d.st_mtime_ns:
+        return True
+    return _digest(source) == _digest(destination)
+
+
+_links = ("copy", "hardlink", "reflink", "symlink")
+"""The ways :func:`_copy` can put a file in the build directory."""
+
+
+def _detach(path: pathlib.Path) -> None:
+    """
+    Remove ``path`` if it is a link, so that writing to it does not modify
+    the file it links to.
+    """
+    try:
+        if path.is_symlink() or path.stat().st_nlink > 1:
+            path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _reflink(source: pathlib.Path, destination: pathlib.Path) -> None:
+    """
+    Copy ``source`` to ``destination`` using :func:`os.copy_file_range`,
+    which lets the filesystem share the underlying blocks between the two
+    files instead of duplicating them, if it supports that.
+    """
+    size = source.stat().st_size
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        offset = 0
+        while offset < size:
+            n = os.copy_file_range(src.fileno(), dst.fileno(), size - offset)
+            if n == 0:
+                break
+            offset += n
+
+
+def _copy(
+    source: pathlib.Path,
+    destination: pathlib.Path,
+    incremental: bool = False,
+    link: str = "copy",
+) -> None:
+    """
+    Copy ``source`` to ``destination``.
+
+    If ``incremental``, a destination which is already up to date is left
+    alone, and the modification time of the source is kept so that the next
+    comparison does not need to read either file.
+
+    ``link`` is one of :data:`_links`, and is how the file is put at
+    ``destination``.
+    If the filesystem does not support that, the file is copied instead.
+    """
+    if link not in _links:
+        raise ValueError(f"unrecognized link {link!r}, expected one of {_links}")
+
+    if incremental and _up_to_date(source, destination):
+        return
+
+    _detach(destination)
+
+    if link != "copy":
+        try:
+            _link(source, destination, link)
+        except (OSError, AttributeError):
+            # Links are not possible across filesystems or on every
+            # filesystem, and `os.copy_file_range` is missing on some
+            # platforms, so fall back to an ordinary copy.
+            destination.unlink(missing_ok=True)
+        else:
+            if incremental and link == "reflink":
+                shutil.copystat(source, destination)
+            return
+
+    shutil.copyfile(source, destination)
+    if incremental:
+        shutil.copystat(source, destination)
+
+
+def _link(source: pathlib.Path, destination: pathlib.Path, link: str) -> None:
+    """
+    Put ``source`` at ``destination`` using one of the non-copying
+    strategies in :data:`_links`.
+    """
+    destination.unlink(missing_ok=True)
+    if link == "hardlink":
+        os.link(source, destination)
+    elif link == "symlink":
+        destination.symlink_to(source.resolve())
+    else:
+        _reflink(source, destination)
+
+
+def _replace(temporary: pathlib.Path, destination: pathlib.Path) -> None:
+    """
+    Move the newly written file ``temporary`` to ``destination``, unless
+    ``destination`` already has the same contents, in which case it is left
+    alone so that its modification time does not change.
+    """
+    try:
+        same = destination.stat().st_size == temporary.stat().st_size
+    except FileNotFoundError:
+        same = False
+    if same and _digest(temporary) == _digest(destination):
+        temporary.unlink()
+    else:
+        os.replace(temporary, destination)
+
+
+def _snapshot(paths: Iterable[pathlib.Path]) -> dict[pathlib.Path, None | tuple]:
+    """
+    The modification time and size of each file in ``paths``, or :obj:`None`
+    for a file which does not exist, so that two snapshots compare equal
+    unless one of the files changed in between.
+    """
+    result = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            result[path] = None
+        else:
+            result[path] = (stat.st_mtime_ns, stat.st_size)
+    return result
@@ -1,18 +1,84 @@
+import functools
+
 import numpy as np
 import astropy.units as u
+from astropy.units.format import Latex
 
 __all__ = [
     "format_quantity",
+    "unit_cache_info",
 ]
 
 
+@functools.lru_cache(maxsize=1024)
+def _latex_unit(unit: u.UnitBase) -> str:
+    """
+    The same text as ``format(unit, "latex_inline")``, remembered for the most
+    recently used units, since converting a unit to LaTeX is slow and most
+    documents use the same few units many times.
+    """
+    return format(unit, "latex_inline")
+
+
+def unit_cache_info() -> functools._CacheInfo:
+    """
+    The number of hits and misses of the cache of units converted to LaTeX,
+    which is shared by :func:`format_quantity` and :class:`Variable`.
+    """
+    return _latex_unit.cache_info()
+
+
+def _latex_quantity(a: u.Quantity) -> str:
+    """
+    The same text as ``format(a, "latex_inline")``, but with the units from
+    the cache.
+    """
+    if a.ndim != 0 or a.dtype.kind == "c":
+        return format(a, "latex_inline")
+
+    precision = np.get_printoptions()["precision"]
+    value = Latex.format_exponential_notation(a.value, format_spec=f".{precision}g")
+
+    unit = _latex_unit(a.unit)[1:-1]
+    if not unit.removeprefix("\\mathrm{").startswith("{}^"):
+        unit = rf" \; {unit}"
+
+    return f"${value}{unit}$"
+
+
 def format_quantity(
     a: u.Quantity,
     scientific_notation: None | bool = None,
     digits_after_decimal: int = 3,
+    *,
+    edgeitems: None | int = None,
+    shared_exponent: bool = False,
 ) -> str:
-    estr = r"${0.value:0." + str(digits_after_decimal) + r"e}\,${0.unit:latex_inline}"
-    fstr = r"${0.value:0." + str(digits_after_decimal) + r"f}\,${0.unit:latex_inline}"
+    """
+    Format a quantity as LaTeX, with a fixed number of digits after the
+    decimal.
+
+    Parameters
+    ----------
+    a
+        The quantity to format.
+    scientific_notation
+        Flag controlling whether to use scientific notation.
+        If :obj:`None`, scientific notation is used if ``np.all(values.abs() < .1)``
+    digits_after_decimal
+        Number of digits to include after the decimal
+    edgeitems
+        If ``a`` is an array, only this many elements are written at the
+        start and at the end of each axis which is longer than twice this
+        number, with ``\\dots`` in between.
+        Setting this or ``shared_exponent`` writes the whole array in math mode,
+        and only formats the elements which are written.
+    shared_exponent
+        If ``a`` is an array written in scientific notation, write one power
+        of ten for the whole array, instead of one for each element.
+    """
+    unit = _latex_unit(a.unit)
+    fstr = r"${0.value:0." + str(digits_after_decimal) + r"f}\,$"
 
     if scientific_notation is None:
         if np.any(np.abs(a.value) > 0.1):
@@ -22,20 +88,29 @@ def format_quantity(
 
     if a.ndim == 0:
         if not scientific_notation:
-            return fstr.format(a)
+            return fstr.format(a) + unit
         else:
             if a != 0:
-                unit = a.unit
                 exponent = np.floor(np.log10(np.abs(a.value)))
                 mantissa = a / 10**exponent
                 format_str = (
-                    "${0:0."
-                    + str(digits_after_decimal)
-                    + "f} \\times 10^{{{1}}}\\,${2:latex_inline}"
+                    "${0:0." + str(digits_after_decimal) + "f} \\times 10^{{{1}}}\\,$"
                 )
-                return format_str.format(mantissa.value, exponent.astype(int), unit)
+                return format_str.format(mantissa.value, exponent.astype(int)) + unit
             else:
-                return fstr.format(a)
+                return fstr.format(a) + unit
+
+    elif edgeitems is not None or shared_exponent:
+        return (
+            _format_array(
+                value=a.value,
+                scientific_notation=scientific_notation,
+                digits_after_decimal=digits_after_decimal,
+                edgeitems=edgeitems,
+                shared_exponent=shared_exponent,
+            )
+            + unit
+        )
 
     else:
         base_str = "{:0." + str(digits_after_decimal)
@@ -44,7 +119,7 @@ def format_quantity(
         else:
             formatter = base_str + "e}"
 
-        return "{0} {1:latex_inline}".format(
+        return "{0} {1}".format(
             np.array2string(
                 a=a.value,
                 precision=digits_after_decimal,
@@ -53,5 +128,110 @@ def format_quantity(
                 max_line_width=200,
                 formatter=dict(float_kind=formatter.format),
             ),
-            a.unit,
+            unit,
         )
+
+
+def _format_values(
+    value: np.ndarray,
+    scientific: np.ndarray,
+    digits_after_decimal: int,
+) -> np.ndarray:
+    """
+    The text of each element of ``value``, without math mode or units, in
+    scientific notation wherever ``scientific`` is true and the element is
+    not zero.
+    """
+    scientific = scientific & (value != 0)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        exponent = np.floor(np.log10(np.abs(np.where(scientific, value, 1))))
+        mantissa = value / 10**exponent
+        exponent = exponent.astype(int)
+
+    # Converting the numbers to text one at a time with `%` is faster than
+    # `np.char.mod`, so only the arithmetic is done with arrays.
+    fixed = "%." + str(digits_after_decimal) + "f"
+    if not scientific.any():
+        text = list(map(fixed.__mod__, value.ravel().tolist()))
+    else:
+        sci = fixed + " \\times 10^{%d}"
+        text = [
+            sci % (m, e) if s else fixed % v
+            for v, m, e, s in zip(
+                value.ravel().tolist(),
+                mantissa.ravel().tolist(),
+                exponent.ravel().tolist(),
+                scientific.ravel().tolist(),
+            )
+        ]
+
+    return np.array(text, dtype=object).reshape(value.shape)
+
+
+def _format_scalars(
+    a: u.Quantity,
+    scientific_notation: None | bool = None,
+    digits_after_decimal: int = 3,
+) -> list[str]:
+    """
+    The same text as :func:`format_quantity` for each element of ``a``,
+    but formatted all at once, and with the units only formatted once.
+    """
+    value = np.ravel(a.value).astype(float)
+    unit = _latex_unit(a.unit)
+
+    if scientific_notation is None:
+        scientific = ~(np.abs(value) > 0.1)
+    else:
+        scientific = np.full(value.shape, scientific_notation)
+
+    result = _format_values(value, scientific, digits_after_decimal)
+    return [f"${s}\\,${unit}" for s in result]
+
+
+def _format_array(
+    value: np.ndarray,
+    scientific_notation: bool,
+    digits_after_decimal: int,
+    edgeitems: None | int,
+    shared_exponent: bool,
+) -> str:
+    """
+    The text of an array for :func:`format_quantity`, without its units,
+    which only formats the elements which are written, all at once.
+    """
+    value = np.asarray(value, dtype=float)
+
+    exponent = None
+    if scientific_notation and shared_exponent:
+        nonzero = np.abs(value[np.isfinite(value) & (value != 0)])
+        if nonzero.size:
+            exponent = int(np.floor(np.log10(nonzero.max())))
+
+    summarized = []
+    for axis, n in enumerate(value.shape):
+        summarize = edgeitems is not None and n > 2 * edgeitems
+        if summarize:
+            index = np.r_[0:edgeitems, n - edgeitems : n]
+            value = np.take(value, index, axis=axis)
+        summarized.append(summarize)
+
+    if exponent is not None:
+        mantissa = value / 10.0**exponent
+        text = _format_values(mantissa, False, digits_after_decimal)
+        suffix = f" \\times 10^{{{exponent}}}"
+    else:
+        text = _format_values(value, scientific_notation, digits_after_decimal)
+        suffix = ""
+
+    def join(text: np.ndarray, summarized: list[bool]) -> str:
+        if text.ndim == 1:
+            items = text.tolist()
+        else:
+            items = [join(t, summarized[1:]) for t in text]
+        if summarized[0]:
+            items.insert(edgeitems, r"\dots")
+        return "[" + ", ".join(items) + "]"
+
+    return f"${join(text, summarized)}{suffix}\\,$"
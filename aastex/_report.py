@@ -0,0 +1,226 @@
+import contextlib
+import dataclasses
+import json
+import os
+import pathlib
+import re
+import time
+from collections.abc import Callable, Iterator
+
+__all__ = [
+    "Timing",
+    "BuildReport",
+    "Event",
+]
+
+
+@dataclasses.dataclass
+class Timing:
+    """
+    How long one part of a build took, and how much it wrote.
+    """
+
+    name: str
+    """What was timed, such as the name of a stage, an image, or a pass."""
+
+    wall: float = 0
+    """The elapsed time in seconds."""
+
+    cpu: None | float = None
+    """
+    The processor time in seconds, including any subprocesses which finished
+    in the meantime, or :obj:`None` if it is not known.
+    """
+
+    bytes: int = 0
+    """The number of bytes written."""
+
+
+def _cpu() -> float:
+    """
+    The processor time used by this process and its finished subprocesses,
+    which include the LaTeX compiler and any worker processes saving figures.
+    """
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+@contextlib.contextmanager
+def _timed(name: str) -> Iterator[Timing]:
+    """
+    Time the body of a ``with`` statement.
+    """
+    result = Timing(name)
+    wall = time.perf_counter()
+    cpu = _cpu()
+    try:
+        yield result
+    finally:
+        result.wall = time.perf_counter() - wall
+        result.cpu = _cpu() - cpu
+
+
+def _size(path: pathlib.Path) -> int:
+    """The size of the file at ``path``, or zero if it does not exist."""
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+@dataclasses.dataclass
+class BuildReport:
+    """
+    Where the time of a build went, filled in by :meth:`Document.generate_pdf`
+    and :meth:`Document.generate_archive`.
+
+    The stages are named after what they do, in the order they run:
+    the ``"traversal"`` of the document, copying the ``"support"`` files,
+    writing the ``"images"``, loading the ``"format"`` if a
+    :class:`FormatCache` is used, computing the lazy ``"variables"`` if there
+    are any, writing the ``"tex"`` file, running the
+    compiler to ``"compile"`` it, and writing the ``"archive"``.
+    The time of each image and each pass of the compiler, such as every run of
+    pdfLaTeX and BibTeX started by ``latexmk``, is recorded separately.
+
+    Examples
+    --------
+
+    Keep track of how long each build of an article takes:
+
+    .. code-block:: python
+
+        report = aastex.BuildReport()
+
+        doc.generate_pdf("article", report=report)
+
+        pathlib.Path("build.json").write_text(report.to_json())
+    """
+
+    stages: list[Timing] = dataclasses.field(default_factory=list)
+    """The time taken by each stage of the build."""
+
+    images: list[Timing] = dataclasses.field(default_factory=list)
+    """The time taken to write each image."""
+
+    passes: list[Timing] = dataclasses.field(default_factory=list)
+    """The time taken by each pass of the compiler."""
+
+    @property
+    def wall(self) -> float:
+        """The total elapsed time of every stage, in seconds."""
+        return sum(stage.wall for stage in self.stages)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[Timing]:
+        """
+        Time the body of a ``with`` statement as the stage ``name``.
+
+        Parameters
+        ----------
+        name
+            The name of the stage.
+        """
+        with _timed(name) as result:
+            self.stages.append(result)
+            yield result
+
+    def to_dict(self) -> dict:
+        """
+        This report as a dictionary of plain Python objects.
+        """
+        return dataclasses.asdict(self)
+
+    def to_json(self, **kwargs) -> str:
+        """
+        This report as a JSON string.
+
+        Parameters
+        ----------
+        kwargs
+            Additional keyword arguments passed to :func:`json.dumps`.
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+@dataclasses.dataclass
+class Event:
+    """
+    Something which happened during a build, sent to :attr:`Document.on_event`
+    as it happens so that long builds can show their progress.
+
+    The kinds of event are
+
+    ``"traversal"``
+        The document was searched for images, and :attr:`total` of them
+        were found.
+    ``"image"``
+        The image :attr:`name` was written, which is number :attr:`index`
+        of the :attr:`total` images being written.
+    ``"pass_started"`` and ``"pass_finished"``
+        Pass number :attr:`index` of the compiler, running the rule
+        :attr:`name`, started or finished.
+    ``"archive_member"``
+        The file :attr:`name` was added to the archive, which is number
+        :attr:`index` of the :attr:`total` files in the archive.
+    """
+
+    kind: str
+    """What happened, one of the kinds listed above."""
+
+    name: str = ""
+    """The name of the image, pass, or file this event is about."""
+
+    index: None | int = None
+    """The number of the image, pass, or file, counting from one."""
+
+    total: None | int = None
+    """The total number of images or files, if it is known."""
+
+    seconds: None | float = None
+    """How long the image or pass took, for events which finish something."""
+
+    time: float = dataclasses.field(default_factory=time.time)
+    """When this event happened, in seconds since the epoch."""
+
+
+_pass_pattern = re.compile(r"^Run number \d+ of rule '([^']+)'")
+"""The line ``latexmk`` prints before each pass."""
+
+
+class _PassTimer:
+    """
+    Time each pass of the compiler from the lines of its output as they are
+    printed, since ``latexmk`` announces each pass before running it.
+    """
+
+    def __init__(
+        self,
+        passes: list[Timing],
+        on_event: None | Callable[[Event], None] = None,
+    ):
+        self.passes = passes
+        self.on_event = on_event
+        self.start = None
+        self.index = 0
+
+    def __call__(self, line: str) -> None:
+        match = _pass_pattern.match(line)
+        if match is not None:
+            self.close()
+            self.passes.append(Timing(match[1]))
+            self.start = time.perf_counter()
+            self.index += 1
+            if self.on_event is not None:
+                self.on_event(Event("pass_started", match[1], self.index))
+
+    def close(self) -> None:
+        """Finish timing the current pass, if there is one."""
+        if self.start is not None:
+            timing = self.passes[-1]
+            timing.wall = time.perf_counter() - self.start
+            self.start = None
+            if self.on_event is not None:
+                event = Event("pass_finished", timing.name, self.index)
+                event.seconds = timing.wall
+                self.on_event(event)
@@ -0,0 +1,127 @@
+import itertools
+from collections.abc import Iterable, Iterator
+
+import pylatex
+import pylatex.section
+import pylatex.utils
+from pylatex.base_classes import Command, Container, Environment, LatexObject
+
+__all__ = []
+
+
+def _lstrip(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    The same chunks of text as ``chunks``, but without the newlines at the
+    start of the text, like :meth:`str.lstrip`.
+    """
+    chunks = iter(chunks)
+    for chunk in chunks:
+        chunk = chunk.lstrip("\n")
+        if chunk:
+            yield chunk
+            break
+    yield from chunks
+
+
+def _rstrip(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    The same chunks of text as ``chunks``, but without the newlines at the
+    end of the text, like :meth:`str.rstrip`.
+
+    Newlines at the end of a chunk are held back until it is known whether
+    anything but newlines follows them.
+    """
+    pending = ""
+    for chunk in chunks:
+        stripped = chunk.rstrip("\n")
+        if stripped:
+            yield pending + stripped
+            pending = chunk[len(stripped) :]
+        else:
+            pending += chunk
+
+
+def _iterdumps(obj: LatexObject) -> Iterator[str]:
+    """
+    The same text as ``obj.dumps()``, in chunks, so that the text of a large
+    document can be written without holding all of it in memory at once.
+
+    Only the containers whose :meth:`dumps` comes from :mod:`pylatex`
+    unchanged are split into chunks, and everything else is written using its
+    own :meth:`dumps`, so the result is always identical.
+    """
+    cls = type(obj)
+    if cls.dumps is Environment.dumps and not obj.omit_if_empty:
+        yield from _iterdumps_environment(obj)
+    elif cls.dumps is pylatex.section.Section.dumps:
+        yield from _iterdumps_section(obj)
+    else:
+        yield obj.dumps()
+
+
+def _iterdumps_content(container: Container) -> Iterator[str]:
+    """The same text as :meth:`pylatex.base_classes.Container.dumps_content`."""
+    if type(container).dumps_content is not Container.dumps_content:
+        yield container.dumps_content()
+        return
+
+    for i, item in enumerate(container):
+        if i:
+            yield container.content_separator
+        if isinstance(item, LatexObject):
+            yield from _iterdumps_as_content(item)
+        else:
+            if not isinstance(item, str):
+                item = str(item)
+            if container.escape:
+                item = pylatex.utils.escape_latex(item)
+            yield item
+
+
+def _iterdumps_as_content(obj: LatexObject) -> Iterator[str]:
+    """
+    The same text as :meth:`pylatex.base_classes.LatexObject.dumps_as_content`.
+    """
+    if type(obj).dumps_as_content is not LatexObject.dumps_as_content:
+        yield obj.dumps_as_content()
+        return
+
+    chunks = _iterdumps(obj)
+    if obj.separate_paragraph or obj.begin_paragraph:
+        chunks = itertools.chain(["\n\n"], _lstrip(chunks))
+    if obj.separate_paragraph or obj.end_paragraph:
+        chunks = itertools.chain(_rstrip(chunks), ["\n\n"])
+    yield from chunks
+
+
+def _iterdumps_environment(environment: Environment) -> Iterator[str]:
+    """The same text as :meth:`pylatex.base_classes.Environment.dumps`."""
+    if environment.arguments is None:
+        extra_arguments = pylatex.base_classes.Arguments()
+    else:
+        extra_arguments = environment.arguments
+
+    begin = Command(
+        "begin",
+        environment.start_arguments,
+        environment.options,
+        extra_arguments=extra_arguments,
+    )
+    begin.arguments._positional_args.insert(0, environment.latex_name)
+
+    yield begin.dumps() + environment.content_separator
+    yield from _iterdumps_content(environment)
+    yield environment.content_separator
+    yield Command("end", environment.latex_name).dumps()
+
+
+def _iterdumps_section(section: pylatex.section.Section) -> Iterator[str]:
+    """The same text as :meth:`pylatex.section.Section.dumps`."""
+    num = "" if section.numbering else "*"
+
+    yield Command(section.latex_name + num, section.title).dumps()
+    if section.label is not None:
+        yield "%\n"
+        yield section.label.dumps()
+    yield "%\n"
+    yield from _iterdumps_content(section)
@@ -1,18 +1,27 @@
+import asyncio
+import concurrent.futures
 import pathlib
 import shutil
 import subprocess
+import sys
 import tarfile
+import threading
+import time
 import zipfile
+from collections.abc import Callable
 
 import pytest
 import pylatex
 import numpy as np
 import matplotlib
+import matplotlib.figure
+import matplotlib.ticker
 
 matplotlib.use("agg")
 
 import matplotlib.pyplot as plt  # noqa: E402
 import astropy.units as u  # noqa: E402
+import astropy.table  # noqa: E402
 import aastex  # noqa: E402
 
 
@@ -229,6 +238,256 @@ class TestVariable:
         assert isinstance(a.dumps(), str)
 
 
+@pytest.mark.parametrize(
+    argnames="factory,change",
+    argvalues=[
+        (lambda **k: aastex.Title("A title", **k), dict(name="Another title")),
+        (lambda **k: aastex.Affiliation("A university", **k), dict(name="Another")),
+        (
+            lambda **k: aastex.Author(
+                "Jane Doe",
+                aastex.Affiliation("A university"),
+                **k,
+            ),
+            dict(email="jane.doe@fancy.edu"),
+        ),
+        (lambda **k: aastex.Acronym("AAS", "the AAS", **k), dict(plural=True)),
+        (lambda **k: aastex.Variable("foo", 1 * u.m, **k), dict(value=2 * u.m)),
+    ],
+)
+def test_memoize(
+    monkeypatch: pytest.MonkeyPatch,
+    factory: Callable[..., pylatex.base_classes.LatexObject],
+    change: dict,
+):
+    a = factory(memoize=True)
+    b = factory()
+    assert a == b
+    assert repr(a) == repr(b)
+
+    expected = b.dumps()
+    assert a.dumps() == expected
+
+    # the text is remembered rather than written again
+    calls = []
+    dumps = pylatex.Command.dumps
+    monkeypatch.setattr(
+        pylatex.Command,
+        "dumps",
+        lambda self: calls.append(self) or dumps(self),
+    )
+    assert a.dumps() == expected
+    assert len(calls) == (1 if isinstance(a, aastex.Author) else 0)
+
+    # changing an attribute forgets the text
+    for name, value in change.items():
+        setattr(a, name, value)
+        setattr(b, name, value)
+    assert a.dumps() == b.dumps() != expected
+
+
+def test_memoize_author_affiliation():
+    """An author shows changes to their affiliations even if memoized."""
+    affiliation = aastex.Affiliation("A university", memoize=True)
+    author = aastex.Author("Jane Doe", affiliation, memoize=True)
+    author.dumps()
+
+    affiliation.name = "Another university"
+
+    assert r"\affiliation{Another university}" in author.dumps()
+
+
+_variables = dict(
+    speed=3e8 * u.m / u.s,
+    small=-2.5e-5 * u.m / u.s,
+    zero=0 * u.m / u.s,
+    wavelength=171 * u.AA,
+    ratio=np.float64(0.05) * u.dimensionless_unscaled,
+    array=[1, 2, 3] * u.s,
+    count=42,
+    label="a_b",
+)
+
+
+@pytest.mark.parametrize("scientific_notation", [None, False, True])
+def test_variable_table(scientific_notation: None | bool):
+    expected = aastex.Document()
+    for name, value in _variables.items():
+        if isinstance(value, u.Quantity):
+            expected.set_variable_quantity(
+                name,
+                value,
+                scientific_notation=scientific_notation,
+                digits_after_decimal=2,
+            )
+        else:
+            expected.set_variable(name, value)
+
+    doc = aastex.Document()
+    doc.set_variables(
+        _variables,
+        scientific_notation=scientific_notation,
+        digits_after_decimal=2,
+    )
+
+    assert len(doc.variables) == 1
+    assert doc.dumps() == expected.dumps()
+
+
+def test_variable_table_astropy():
+    table = astropy.table.QTable(
+        dict(
+            name=["speed", "small"],
+            value=[3e8, -2.5e-5] * u.m / u.s,
+        )
+    )
+
+    expected = aastex.Document()
+    for row in table:
+        expected.set_variable_quantity(row["name"], row["value"])
+
+    doc = aastex.Document()
+    doc.set_variables(table)
+
+    assert doc.dumps() == expected.dumps()
+
+
+@pytest.mark.parametrize(
+    argnames="table,expected",
+    argvalues=[
+        (
+            astropy.table.QTable(dict(name=["a", "b"], value=[[1, 2], [3, 4]] * u.m)),
+            dict(a=[1, 2] * u.m, b=[3, 4] * u.m),
+        ),
+        (
+            astropy.table.Table(dict(name=["a", "b"], value=[1.5, 2])),
+            dict(a=1.5, b=2.0),
+        ),
+        (
+            astropy.table.Table(dict(name=["a", "b"], value=["fast", "50%"])),
+            dict(a="fast", b="50%"),
+        ),
+        (
+            astropy.table.Table(
+                dict(name=["a", "b"], value=[1.5, 2]),
+                units=dict(value=u.s),
+            ),
+            dict(a=1.5 * u.s, b=2 * u.s),
+        ),
+    ],
+)
+def test_variable_table_astropy_rows(table: astropy.table.Table, expected: dict):
+    """Each row is written like the value in it would be on its own."""
+    doc = aastex.Document()
+    doc.set_variables(table)
+
+    expected_doc = aastex.Document()
+    for name, value in expected.items():
+        if isinstance(value, u.Quantity):
+            expected_doc.set_variable_quantity(name, value)
+        else:
+            expected_doc.set_variable(name, value)
+
+    assert doc.dumps() == expected_doc.dumps()
+
+
+def test_variable_table_redefine():
+    doc = aastex.Document()
+    doc.set_variables(dict(foo=1 * u.m, bar=2 * u.m))
+    doc.set_variables(dict(foo=3 * u.m, baz=4 * u.m))
+    doc.set_variable("bar", "5")
+
+    assert doc.dumps().count(r"\newcommand{\foo}") == 1
+    assert doc.dumps().count(r"\renewcommand{\foo}") == 1
+    assert doc.dumps().count(r"\renewcommand{\bar}{5}") == 1
+    assert r"\newcommand{\baz}" in doc.dumps()
+
+
+def test_variable_lazy():
+    calls = []
+
+    def compute() -> u.Quantity:
+        calls.append(None)
+        return 3 * u.m
+
+    a = aastex.Variable("foo", compute)
+    assert not calls
+
+    assert a.dumps() == aastex.Variable("foo", 3 * u.m).dumps()
+    assert a.dumps() == aastex.Variable("foo", 3 * u.m).dumps()
+    assert len(calls) == 1
+
+
+def test_generate_pdf_lazy_variables(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    # each of these only returns once the other has started, so they must be
+    # computed at the same time
+    barrier = threading.Barrier(2, timeout=10)
+    calls = []
+
+    def compute(value: u.Quantity) -> Callable[[], u.Quantity]:
+        def function() -> u.Quantity:
+            calls.append(value)
+            barrier.wait()
+            return value
+
+        return function
+
+    future = concurrent.futures.Future()
+    future.set_result(0.5 * u.s)
+
+    doc = aastex.Document()
+    doc.set_variable_quantity("speed", compute(3e8 * u.m / u.s))
+    doc.set_variable_quantity("length", compute(2 * u.m), digits_after_decimal=1)
+    doc.set_variable_quantity("duration", future)
+    doc.set_variable_quantity("unused", compute(1 * u.kg))
+    doc.set_variable_quantity("lengthy", 5 * u.m)
+    text = pylatex.NoEscape(r"\speed and \length{} in \duration, \lengthy.")
+    doc.append(text)
+
+    expected = aastex.Document()
+    expected.set_variable_quantity("speed", 3e8 * u.m / u.s)
+    expected.set_variable_quantity("length", 2 * u.m, digits_after_decimal=1)
+    expected.set_variable_quantity("duration", 0.5 * u.s)
+    expected.set_variable_quantity("lengthy", 5 * u.m)
+    expected.append(text)
+
+    texts = []
+    monkeypatch.setattr(
+        pylatex.Document,
+        "generate_pdf",
+        lambda self, filepath, **kwargs: texts.append(self.dumps()),
+    )
+
+    doc.generate_pdf(tmp_path / "article")
+
+    assert texts == [expected.dumps()]
+    assert sorted(calls, key=str) == [2 * u.m, 3e8 * u.m / u.s]
+
+    # the unused variable is still computed if the text is written directly
+    barrier = threading.Barrier(1)
+    assert r"\newcommand{\unused}" in doc.dumps()
+
+
+@pytest.mark.parametrize(
+    argnames="chunks, expected",
+    argvalues=[
+        (["\\speed and \\length."], {"speed", "length"}),
+        (["\\spe", "ed and \\len", "gth", "y"], {"speed"}),
+        (["\\length", "y"], set()),
+        (["\\lengthy", ""], set()),
+        (["a", "\\", "speed"], {"speed"}),
+        ([], set()),
+    ],
+)
+def test_commands_used(chunks: list[str], expected: set[str]):
+    """Commands are found even if they are split between chunks."""
+    names = ["speed", "length"]
+    assert aastex._aastex._commands_used(chunks, names) == expected
+
+
 @pytest.mark.parametrize(
     argnames="a",
     argvalues=[
@@ -311,6 +570,82 @@ def _figure_with_plot(label: str = "myFigure", **kwargs) -> aastex.Figure:
     return result
 
 
+def _plot() -> matplotlib.figure.Figure:
+    """A figure factory, defined at the top level so that it can be pickled."""
+    fig, ax = plt.subplots()
+    ax.plot(np.arange(11))
+    return fig
+
+
+def test_figure_add_fig_factory(tmp_path: pathlib.Path):
+    """A figure factory is only called when the image is written."""
+    calls = []
+
+    def factory():
+        calls.append(_plot())
+        return calls[-1]
+
+    a = aastex.Figure("myFigure")
+    a.add_fig(factory, width=None)
+
+    assert not calls
+
+    (image,) = a.images
+    image.write(tmp_path)
+
+    assert (tmp_path / "myFigure.pdf").exists()
+    assert len(calls) == 1
+    assert calls[0].number not in plt.get_fignums()
+
+
+def test_generate_pdf_factory_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    figure = aastex.Figure("myFigure")
+    figure.add_fig(_plot, width=None)
+
+    doc = aastex.Document()
+    doc.append(figure)
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    doc.generate_pdf(tmp_path / "article", workers=2)
+
+    assert (tmp_path / "myFigure.pdf").exists()
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_generate_pdf_release(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+    workers: None | int,
+):
+    """A released figure is closed, and later builds reuse the saved file."""
+    fig = _plot()
+
+    figure = aastex.Figure("myFigure")
+    figure.add_fig(fig, width=None)
+
+    doc = aastex.Document()
+    doc.append(figure)
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    first = tmp_path / "first"
+    doc.generate_pdf(first / "article", release=True, workers=workers)
+
+    (image,) = doc.images
+    assert image.figure is None
+    assert image.source == (first / "myFigure.pdf").resolve()
+    assert fig.number not in plt.get_fignums()
+
+    second = tmp_path / "second"
+    doc.generate_pdf(second / "article")
+
+    assert (second / "myFigure.pdf").read_bytes() == image.source.read_bytes()
+
+
 def test_image_is_public():
     """The images of a figure are instances of a documented, public class."""
     a = _figure_with_plot()
@@ -392,6 +727,51 @@ def test_figure_add_image(tmp_path: pathlib.Path, as_string: bool):
     assert (destination / "diagram.png").exists()
 
 
+@pytest.mark.parametrize("link", ["copy", "hardlink", "reflink", "symlink"])
+def test_image_write_link(tmp_path: pathlib.Path, link: str):
+    source = tmp_path / "diagram.png"
+    source.write_bytes(b"an image")
+
+    image = aastex.Image(name="diagram.png", source=source)
+
+    destination = tmp_path / "build"
+    destination.mkdir()
+
+    result = image.write(destination, link=link)
+
+    assert result.read_bytes() == b"an image"
+    if link == "hardlink":
+        assert result.stat().st_ino == source.stat().st_ino
+    if link == "symlink":
+        assert result.is_symlink()
+
+
+def test_image_write_link_unknown(tmp_path: pathlib.Path):
+    source = tmp_path / "diagram.png"
+    source.write_bytes(b"an image")
+
+    image = aastex.Image(name="renamed.png", source=source)
+
+    with pytest.raises(ValueError, match="unrecognized link"):
+        image.write(tmp_path, link="teleport")
+
+
+def test_image_write_over_link(tmp_path: pathlib.Path):
+    """Saving a figure over a linked file does not modify the original."""
+    source = tmp_path / "myFigure.png"
+    source.write_bytes(b"an image")
+
+    build = tmp_path / "build"
+    build.mkdir()
+    aastex.Image(name="myFigure.png", source=source).write(build, link="hardlink")
+
+    (image,) = _figure_with_plot(extension="png").images
+    image.write(build)
+
+    assert source.read_bytes() == b"an image"
+    assert (build / "myFigure.png").read_bytes() != b"an image"
+
+
 def test_figure_add_image_same_directory(tmp_path: pathlib.Path):
     """Writing an image that already lives in the build directory is a no-op."""
     source = tmp_path / "diagram.png"
@@ -433,6 +813,22 @@ class TestFig:
         assert image.name in a.dumps()
 
 
+def test_fig_factory(tmp_path: pathlib.Path):
+    a = aastex.Fig(_plot, width=r"\textwidth", caption="a caption", filename="f1")
+
+    (image,) = a.images
+    assert image.name == "f1.pdf"
+    assert image.name in a.dumps()
+
+    image.write(tmp_path)
+    assert (tmp_path / "f1.pdf").exists()
+
+
+def test_fig_factory_filename():
+    with pytest.raises(ValueError, match="filename"):
+        aastex.Fig(_plot, width=r"\textwidth", caption="a caption")
+
+
 @pytest.mark.parametrize(
     argnames="a",
     argvalues=[
@@ -493,6 +889,80 @@ def test_document_linenumbers_disabled():
     assert "linenumbers" not in aastex.Document(linenumbers=False).dumps()
 
 
+def test_document_draft():
+    options = aastex.Document(draft=True).dumps().split("{aastex701}")[0]
+    assert "draft" in options
+    assert "draft" not in aastex.Document().dumps()
+
+
+def test_document_draft_graphics():
+    """A draft still draws the images, which graphicx would leave out."""
+    doc = aastex.Document(draft=True)
+    preamble = doc.dumps().split(r"\begin{document}")[0]
+    assert r"\setkeys{Gin}{draft=false}" in preamble
+    assert "Gin" not in aastex.Document().dumps()
+
+
+def test_generate_pdf_draft(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    """A draft saves figures quickly without changing them for the final version."""
+    fig, ax = plt.subplots()
+    (line,) = ax.plot(np.random.normal(size=100_000))
+    plt.close(fig)
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    sizes = {}
+    for draft in (True, False):
+        figure = aastex.Figure("myFigure")
+        figure.add_fig(fig, width=None, extension="svg")
+        doc = aastex.Document(draft=draft)
+        doc.append(figure)
+
+        directory = tmp_path / str(draft)
+        doc.generate_pdf(directory / "article", release=True)
+        sizes[draft] = (directory / "myFigure.svg").stat().st_size
+
+        assert not line.get_rasterized()
+
+        # a draft figure is saved again for the final version
+        assert (figure.images[0].figure is None) == (not draft)
+
+    assert sizes[True] < sizes[False] / 2
+
+
+@pytest.mark.parametrize("extension", ["svg", "png"])
+def test_image_write_rasterize_threshold(
+    tmp_path: pathlib.Path,
+    caplog: pytest.LogCaptureFixture,
+    extension: str,
+):
+    """Dense artists are rasterized only in vector graphics."""
+    fig, ax = plt.subplots()
+    (dense,) = ax.plot(np.random.normal(size=100_000))
+    (sparse,) = ax.plot(np.random.normal(size=10))
+    plt.close(fig)
+
+    image = aastex.Image(name=f"myFigure.{extension}", figure=fig)
+
+    (tmp_path / "full").mkdir()
+    (tmp_path / "light").mkdir()
+
+    with caplog.at_level("INFO", logger="aastex"):
+        full = image.write(tmp_path / "full", rasterize_threshold=None)
+        light = image.write(tmp_path / "light", rasterize_threshold=1000)
+
+    assert not dense.get_rasterized()
+
+    if extension == "svg":
+        assert light.stat().st_size < full.stat().st_size / 2
+        assert "rasterizing 1 artists drawing 100000 points" in caplog.text
+    else:
+        assert not caplog.text
+
+
 @pytest.mark.parametrize(
     argnames="document_options",
     argvalues=[
@@ -674,95 +1144,1045 @@ def test_generate_pdf_repeated_image(
     assert (build / "logo.png").exists()
 
 
-def test_document_images():
-    figure = _figure_with_plot()
+def test_generate_pdf_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    """Figures saved by a process pool are identical to those saved serially."""
+    doc = aastex.Document()
+    for label in ("first", "second", "third"):
+        doc.append(_figure_with_plot(label, extension="png"))
 
-    section = aastex.Section("A section")
-    section.append(figure)
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
 
-    doc = aastex.Document()
-    doc.append(section)
+    doc.generate_pdf(tmp_path / "serial" / "article")
+    doc.generate_pdf(tmp_path / "parallel" / "article", workers=2)
 
-    assert [i.name for i in doc.images] == ["myFigure.pdf"]
+    for label in ("first", "second", "third"):
+        serial = tmp_path / "serial" / f"{label}.png"
+        parallel = tmp_path / "parallel" / f"{label}.png"
+        assert serial.read_bytes() == parallel.read_bytes()
 
 
-def _submittable_document() -> aastex.Document:
-    """A small but complete document, for the archive tests below."""
-    doc = aastex.Document()
-    doc.append(aastex.Title("An interesting article"))
-    doc += [
-        aastex.Author(
-            name="Jane Doe",
-            affiliation=aastex.Affiliation("Fancy University"),
-        ),
-        aastex.Author(
-            name="John Roe",
-            affiliation=aastex.Affiliation("Fancy University"),
-            altaffiliation="Deceased",
-        ),
-    ]
-    section = aastex.Section("A section")
-    section.append("Some text.")
-    section.append(_figure_with_plot())
-    doc.append(section)
-    return doc
+def test_generate_pdf_workers_unpicklable(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+    caplog: pytest.LogCaptureFixture,
+):
+    """A figure which cannot be sent to a worker is saved in this process."""
+    unpicklable = _plot()
+    unpicklable.axes[0].xaxis.set_major_formatter(
+        matplotlib.ticker.FuncFormatter(lambda x, pos: f"{x} m")
+    )
+    plt.close(unpicklable)
 
+    doc = aastex.Document()
+    doc.append(_figure_with_plot("first", extension="png"))
+    figure = aastex.Figure("second")
+    figure.add_fig(unpicklable, width=None, extension="png")
+    doc.append(figure)
 
-def _fake_compiler(monkeypatch: pytest.MonkeyPatch) -> None:
-    """
-    Stand in for the LaTeX compiler, which is not installed everywhere,
-    by writing the files that a real compilation would leave behind.
-    """
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
 
-    def compile(self, filepath, **kwargs):
-        filepath = pathlib.Path(filepath)
-        filepath.with_suffix(".tex").write_text("a compiled document")
-        filepath.with_suffix(".bbl").write_text("a formatted bibliography")
+    doc.generate_pdf(tmp_path / "article", workers=2)
 
-    monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+    assert (tmp_path / "first.png").exists()
+    assert (tmp_path / "second.png").exists()
+    assert "'second.png' in this process" in caplog.text
 
 
-@pytest.mark.parametrize(
-    argnames="format,suffix",
-    argvalues=[
-        ("zip", ".zip"),
-        ("gztar", ".tar.gz"),
-    ],
-)
-def test_generate_archive(
-    tmp_path: pathlib.Path,
+def test_generate_pdf_executor(
     monkeypatch: pytest.MonkeyPatch,
-    format: str,
-    suffix: str,
+    tmp_path: pathlib.Path,
 ):
-    doc = _submittable_document()
-    _fake_compiler(monkeypatch)
+    doc = aastex.Document()
+    doc.append(_figure_with_plot())
 
-    archive = doc.generate_archive(tmp_path / "article", format=format)
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
 
-    assert archive == (tmp_path / "article").with_suffix(suffix)
-    assert archive.exists()
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        doc.generate_pdf(tmp_path / "article", executor=executor)
 
-    if format == "zip":
-        with zipfile.ZipFile(archive) as f:
-            names = f.namelist()
-    else:
-        with tarfile.open(archive) as f:
-            names = f.getnames()
+    assert (tmp_path / "myFigure.pdf").exists()
 
-    # the AAS submission system cannot parse subdirectories
-    assert not any("/" in name for name in names)
 
-    assert set(names) == {
-        "article.tex",
-        "article.bbl",
-        "aastex701.cls",
-        "aasjournalv7.bst",
-        "orcid-ID.png",
+def test_generate_pdf_workers_and_executor(tmp_path: pathlib.Path):
+    doc = aastex.Document()
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        with pytest.raises(ValueError, match="only one"):
+            doc.generate_pdf(tmp_path / "article", workers=2, executor=executor)
+
+
+def test_generate_pdf_workers_duplicate_label(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    doc = aastex.Document()
+    doc.append(_figure_with_plot())
+    doc.append(_figure_with_plot())
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    with pytest.raises(ValueError, match="myFigure"):
+        doc.generate_pdf(tmp_path / "article", workers=2)
+
+
+@pytest.mark.parametrize("extension", ["png", "pdf", "svg", "eps"])
+def test_generate_pdf_incremental(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+    extension: str,
+):
+    """Files which are already up to date are not written again."""
+    source = tmp_path / "diagram.png"
+    plt.figure().savefig(source)
+
+    doc = aastex.Document()
+    doc.append(_figure_with_plot(extension=extension))
+    figure = aastex.Figure("diagram")
+    figure.add_image(source, width=None)
+    doc.append(figure)
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    build = tmp_path / "build"
+    names = [f"myFigure.{extension}", "diagram.png", "aastex701.cls"]
+
+    doc.generate_pdf(build / "article", incremental=True)
+    before = {name: (build / name).stat().st_mtime_ns for name in names}
+
+    # vector graphics are dated to the second unless the date is fixed
+    if extension != "png":
+        time.sleep(1.1)
+
+    doc.generate_pdf(build / "article", incremental=True)
+    after = {name: (build / name).stat().st_mtime_ns for name in names}
+
+    assert before == after
+    assert sorted(p.name for p in build.glob("*.png")) == sorted(
+        ["diagram.png", "orcid-ID.png"]
+        + [f"myFigure.{extension}"] * (extension == "png")
+    )
+    assert not list(build.glob("tmp*"))
+
+
+def test_generate_pdf_incremental_support_files(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    """The AASTeX files are kept up to date, and removed by a clean build."""
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    build = tmp_path / "build"
+    build.mkdir()
+    stale = build / "aastex701.cls"
+    stale.write_text("the class file of an older version")
+
+    doc = aastex.Document()
+    doc.generate_pdf(build / "article", incremental=True)
+
+    package = pathlib.Path(aastex.__file__).parent
+    assert stale.read_bytes() == (package / "aastex701.cls").read_bytes()
+
+    doc.generate_pdf(build / "article")
+
+    assert not list(build.iterdir())
+
+
+def test_generate_pdf_incremental_changed(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    """A source image which changed is copied again."""
+    source = tmp_path / "diagram.png"
+    source.write_bytes(b"old")
+
+    doc = aastex.Document()
+    figure = aastex.Figure("diagram")
+    figure.add_image(source, width=None)
+    doc.append(figure)
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    build = tmp_path / "build"
+    doc.generate_pdf(build / "article", incremental=True)
+
+    source.write_bytes(b"new")
+    doc.generate_pdf(build / "article", incremental=True)
+
+    assert (build / "diagram.png").read_bytes() == b"new"
+
+
+def test_generate_pdf_deduplicate(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    """Images with identical contents are stored once, whatever their names."""
+    first = tmp_path / "first.png"
+    second = tmp_path / "second.png"
+    first.write_bytes(b"an image")
+    second.write_bytes(b"an image")
+
+    doc = aastex.Document()
+    for label, source in [("a", first), ("b", second), ("c", first)]:
+        figure = aastex.Figure(label)
+        figure.add_image(source, width=None)
+        doc.append(figure)
+    for label in ["d", "e"]:
+        figure = aastex.Figure(label)
+        figure.add_fig(_plot(), width=None, extension="png")
+        doc.append(figure)
+    doc.append(aastex.Fig(second, width=r"\textwidth", caption="a caption"))
+
+    tex = {}
+
+    def compile(self, filepath, **kwargs):
+        tex["dumps"] = self.dumps()
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+    build = tmp_path / "build"
+    doc.generate_pdf(build / "article", deduplicate=True)
+
+    assert sorted(p.name for p in build.glob("*.png")) == ["d.png", "first.png"]
+    assert [image.filename for image in doc.images] == [
+        "first.png",
+        "first.png",
+        "first.png",
+        "d.png",
+        "d.png",
+        "first.png",
+    ]
+    assert "second.png" not in tex["dumps"]
+    assert "e.png" not in tex["dumps"]
+    assert tex["dumps"].count("{first.png}") == 4
+
+
+def test_document_images():
+    figure = _figure_with_plot()
+
+    section = aastex.Section("A section")
+    section.append(figure)
+
+    doc = aastex.Document()
+    doc.append(section)
+
+    assert [i.name for i in doc.images] == ["myFigure.pdf"]
+
+
+def test_document_images_deep():
+    """Deeply nested documents do not reach the recursion limit."""
+    doc = aastex.Document()
+    parent = doc
+    for i in range(5000):
+        child = aastex.Abstract()
+        parent.append(child)
+        parent = child
+    parent.append(_figure_with_plot())
+
+    assert [i.name for i in doc.images] == ["myFigure.pdf"]
+
+
+def test_document_images_order():
+    doc = aastex.Document()
+    section = aastex.Section("A section")
+    section.append(_figure_with_plot("first"))
+    doc.append(section)
+    doc.append(
+        aastex.Gridline(
+            [
+                aastex.LeftFig("second.pdf", width=r"\textwidth", caption="a"),
+                aastex.RightFig("third.pdf", width=r"\textwidth", caption="b"),
+            ]
+        )
+    )
+    doc.append(_figure_with_plot("fourth"))
+
+    assert [i.name for i in doc.images] == [
+        "first.pdf",
+        "second.pdf",
+        "third.pdf",
+        "fourth.pdf",
+    ]
+
+
+def test_document_index():
+    doc = aastex.Document()
+    section = aastex.Section("Introduction")
+    figure = _figure_with_plot()
+    figure.add_caption("a caption")
+    section.append(figure)
+    doc.append(section)
+    doc.append(aastex.Bibliography("sources"))
+
+    index = aastex._aastex._index(doc)
+
+    assert [i.name for i in index.images] == ["myFigure.pdf"]
+    assert len(index.bibliographies) == 1
+
+
+def _submittable_document() -> aastex.Document:
+    """A small but complete document, for the archive tests below."""
+    doc = aastex.Document()
+    doc.append(aastex.Title("An interesting article"))
+    doc += [
+        aastex.Author(
+            name="Jane Doe",
+            affiliation=aastex.Affiliation("Fancy University"),
+        ),
+        aastex.Author(
+            name="John Roe",
+            affiliation=aastex.Affiliation("Fancy University"),
+            altaffiliation="Deceased",
+        ),
+    ]
+    section = aastex.Section("A section")
+    section.append("Some text.")
+    section.append(_figure_with_plot())
+    doc.append(section)
+    return doc
+
+
+def _fake_compiler(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Stand in for the LaTeX compiler, which is not installed everywhere,
+    by writing the files that a real compilation would leave behind.
+    """
+
+    def compile(self, filepath, **kwargs):
+        filepath = pathlib.Path(filepath)
+        filepath.with_suffix(".tex").write_text("a compiled document")
+        filepath.with_suffix(".bbl").write_text("a formatted bibliography")
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+
+_fake_compiler_script = """
+import pathlib, sys, time
+tex = pathlib.Path(sys.argv[-1])
+time.sleep(float(sys.argv[1]))
+tex.with_suffix(".aux").write_text("auxiliary")
+tex.with_suffix(".pdf").write_text(tex.read_text())
+"""
+"""
+A stand in for the LaTeX compiler, run as ``python -c``, which copies the
+``.tex`` file to the ``.pdf`` file after waiting for the number of seconds
+given as its first argument.
+"""
+
+
+def _fake_compiler_args(delay: float = 0) -> dict:
+    """The arguments of `generate_pdf_async` which run the fake compiler."""
+    return dict(
+        compiler=sys.executable,
+        compiler_args=["-c", _fake_compiler_script, str(delay)],
+    )
+
+
+def test_generate_pdf_async(tmp_path: pathlib.Path):
+    doc = _submittable_document()
+    path = tmp_path / "article"
+
+    asyncio.run(doc.generate_pdf_async(path, **_fake_compiler_args()))
+
+    assert r"\begin{document}" in path.with_suffix(".pdf").read_text()
+    assert (tmp_path / "myFigure.pdf").exists()
+    assert not path.with_suffix(".tex").exists()
+    assert not path.with_suffix(".aux").exists()
+    assert not (tmp_path / "aastex701.cls").exists()
+
+
+def test_generate_pdf_async_concurrent(tmp_path: pathlib.Path):
+    """Several documents can be compiled at once on the same event loop."""
+
+    async def main():
+        await asyncio.gather(
+            *[
+                _submittable_document().generate_pdf_async(
+                    tmp_path / str(i) / "article",
+                    **_fake_compiler_args(0.5),
+                )
+                for i in range(4)
+            ]
+        )
+
+    asyncio.run(main())
+
+    for i in range(4):
+        assert (tmp_path / str(i) / "article.pdf").exists()
+
+
+def test_generate_pdf_async_timeout(tmp_path: pathlib.Path):
+    doc = _submittable_document()
+    path = tmp_path / "article"
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            doc.generate_pdf_async(path, timeout=0.1, **_fake_compiler_args(10))
+        )
+
+    assert not path.with_suffix(".pdf").exists()
+    assert not (tmp_path / "aastex701.cls").exists()
+
+
+def test_generate_pdf_async_cancel(tmp_path: pathlib.Path):
+    doc = _submittable_document()
+    path = tmp_path / "article"
+
+    async def main():
+        task = asyncio.create_task(
+            doc.generate_pdf_async(path, **_fake_compiler_args(10))
+        )
+        await asyncio.sleep(1)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+
+    assert not path.with_suffix(".pdf").exists()
+
+
+_spawning_compiler_script = """
+import pathlib
+import subprocess
+import sys
+
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+pathlib.Path(sys.argv[-1]).with_suffix(".pid").write_text(str(child.pid))
+child.wait()
+"""
+"""
+A stand in for ``latexmk``, which starts another process and waits for it,
+and writes the ID of that process next to the ``.tex`` file.
+"""
+
+
+def _running(pid: int) -> bool:
+    """Whether the process ``pid`` is still running, rather than a zombie."""
+    try:
+        stat = pathlib.Path(f"/proc/{pid}/stat").read_text()
+    except FileNotFoundError:
+        return False
+    return stat.rpartition(")")[2].split()[0] != "Z"
+
+
+@pytest.mark.skipif(
+    not pathlib.Path("/proc/self/stat").exists(),
+    reason="needs /proc to find the state of a process",
+)
+def test_generate_pdf_async_timeout_children(tmp_path: pathlib.Path):
+    """The processes started by the compiler are killed along with it."""
+    doc = _submittable_document()
+    path = tmp_path / "article"
+    start = time.perf_counter()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            doc.generate_pdf_async(
+                path,
+                timeout=1.5,
+                compiler=sys.executable,
+                compiler_args=["-c", _spawning_compiler_script],
+            )
+        )
+
+    # the output of the compiler is read until every process writing it ends
+    assert time.perf_counter() - start < 30
+
+    pid = int(path.with_suffix(".pid").read_text())
+    for _ in range(50):
+        if not _running(pid):
+            break
+        time.sleep(0.1)
+    assert not _running(pid)
+
+
+def test_generate_pdf_async_cancel_images(tmp_path: pathlib.Path):
+    """Cancelling while the images are written still removes the copies."""
+    doc = _submittable_document()
+    doc.on_event = lambda event: time.sleep(0.5) if event.kind == "image" else None
+    path = tmp_path / "article"
+
+    async def main():
+        task = asyncio.create_task(
+            doc.generate_pdf_async(path, **_fake_compiler_args())
+        )
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+
+    assert (tmp_path / "myFigure.pdf").exists()
+    assert not path.with_suffix(".tex").exists()
+    assert not (tmp_path / "aastex701.cls").exists()
+
+
+def test_generate_pdf_async_text_only(tmp_path: pathlib.Path):
+    """A text-only build outlines the images as generate_pdf does."""
+    doc = _submittable_document()
+    path = tmp_path / "article"
+
+    asyncio.run(doc.generate_pdf_async(path, text_only=True, **_fake_compiler_args()))
+
+    # the fake compiler copies the .tex file to the .pdf file
+    text = path.with_suffix(".pdf").read_text()
+    assert r"\setkeys{Gin}{draft}" in text
+    assert "myFigure-placeholder.pdf" in text
+
+
+@pytest.mark.parametrize(
+    argnames="kwargs",
+    argvalues=[
+        dict(include=True),
+        dict(include_only=["A section"]),
+        dict(format_cache=aastex.FormatCache("formats")),
+    ],
+)
+def test_generate_pdf_async_unsupported(tmp_path: pathlib.Path, kwargs: dict):
+    doc = _submittable_document()
+    (name,) = kwargs
+
+    with pytest.raises(TypeError, match=f"does not support {name}"):
+        asyncio.run(doc.generate_pdf_async(tmp_path / "article", **kwargs))
+    with pytest.raises(TypeError, match=f"does not support {name}"):
+        doc.generate_variants(dict(final="twocolumn"), tmp_path / "article", **kwargs)
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_generate_pdf_async_no_compiler(tmp_path: pathlib.Path):
+    doc = _submittable_document()
+
+    with pytest.raises(pylatex.errors.CompilerError):
+        asyncio.run(
+            doc.generate_pdf_async(tmp_path / "article", compiler="not-a-compiler")
+        )
+
+
+def test_watch(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    source = tmp_path / "diagram.png"
+    source.write_bytes(b"an image")
+    script = tmp_path / "script.py"
+    script.write_text("a script")
+
+    def article() -> aastex.Document:
+        doc = aastex.Document()
+        plot = aastex.Figure("plot")
+        plot.add_fig(_plot, width=None, extension="png")
+        doc.append(plot)
+        figure = aastex.Figure("diagram")
+        figure.add_image(source, width=None)
+        doc.append(figure)
+        return doc
+
+    builds = []
+    written = set()
+
+    def compile(self, filepath, **kwargs):
+        builds.append((self, kwargs))
+        written.add((tmp_path / "build" / "plot.png").stat().st_mtime_ns)
+        if len(builds) == 3:
+            raise subprocess.CalledProcessError(1, "latexmk")
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+    # Change one input each time the watcher waits for changes.
+    changes = [
+        lambda: None,
+        lambda: source.write_bytes(b"a new image"),
+        lambda: script.write_text("a new script"),
+        lambda: source.write_bytes(b"a fixed image"),
+    ]
+    monkeypatch.setattr(time, "sleep", lambda seconds: changes.pop(0)())
+
+    rebuilds = []
+
+    def rebuild() -> aastex.Document:
+        rebuilds.append(article())
+        return rebuilds[-1]
+
+    doc = article()
+    cache = aastex.RenderCache(tmp_path / "cache")
+
+    result = doc.watch(
+        tmp_path / "build" / "article",
+        rebuild=rebuild,
+        paths=[script],
+        builds=4,
+        cache=cache,
+    )
+
+    assert not changes
+    assert [document for document, _ in builds] == [doc, doc, *rebuilds * 2]
+    assert result is rebuilds[0]
+    assert all(not kwargs["clean"] for _, kwargs in builds)
+    assert (tmp_path / "build" / "diagram.png").read_bytes() == b"a fixed image"
+
+    # The figure was only saved for the first build, and its file was left
+    # alone after that.
+    assert cache.misses == 1
+    assert cache.hits == 3
+    assert len(written) == 1
+
+
+def test_watch_rebuild_error(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+    caplog: pytest.LogCaptureFixture,
+):
+    """A script which fails to run keeps the previous document being watched."""
+    script = tmp_path / "script.py"
+    script.write_text("a script")
+
+    builds = []
+    monkeypatch.setattr(
+        pylatex.Document,
+        "generate_pdf",
+        lambda self, filepath, **kwargs: builds.append(self),
+    )
+
+    changes = [
+        lambda: script.write_text("a broken script"),
+        lambda: script.write_text("a fixed script"),
+    ]
+    monkeypatch.setattr(time, "sleep", lambda seconds: changes.pop(0)())
+
+    rebuilds = []
+
+    def rebuild() -> aastex.Document:
+        if script.read_text() == "a broken script":
+            raise SyntaxError("invalid syntax")
+        rebuilds.append(aastex.Document())
+        return rebuilds[-1]
+
+    doc = aastex.Document()
+    result = doc.watch(
+        tmp_path / "build" / "article",
+        rebuild=rebuild,
+        paths=[script],
+        builds=2,
+    )
+
+    assert not changes
+    assert builds == [doc, *rebuilds]
+    assert result is rebuilds[0]
+    assert "failed to rebuild the document: invalid syntax" in caplog.text
+
+
+@pytest.mark.parametrize("name", ["clean", "clean_tex", "incremental"])
+def test_watch_fixed_arguments(tmp_path: pathlib.Path, name: str):
+    doc = aastex.Document()
+
+    with pytest.raises(TypeError, match=name):
+        doc.watch(tmp_path / "article", builds=1, **{name: True})
+
+    assert not list(tmp_path.iterdir())
+
+
+def _sectioned_document() -> aastex.Document:
+    doc = aastex.Document()
+    doc.append(aastex.Title("An interesting article"))
+    for title in ["Introduction", "Methods", "Results"]:
+        section = aastex.Section(title)
+        section.append(f"The {title.lower()}.")
+        subsection = aastex.Subsection(f"More {title.lower()}")
+        section.append(subsection)
+        doc.append(section)
+    doc.data[-2].append(_figure_with_plot())
+    return doc
+
+
+def test_generate_pdf_include(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    outputs = []
+
+    def compile(self, filepath, **kwargs):
+        outputs.append(self.dumps())
+        for name in ["Introduction", "Methods", "Results"]:
+            path = tmp_path / f"article-{name}.tex"
+            outputs.append(path.read_text())
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+    doc = _sectioned_document()
+    before = doc.dumps()
+    doc.generate_pdf(tmp_path / "article", include=True)
+
+    main, introduction, methods, results = outputs
+    assert r"\include{article-Introduction}" in main
+    assert r"\include{article-Results}" in main
+    assert r"\includeonly" not in main
+    assert r"\section" not in main
+    assert r"\title{An interesting article}" in main
+
+    assert r"\section{Methods}" in methods
+    assert r"\subsection{More methods}" in methods
+    assert r"\includegraphics" in methods
+
+    # the packages of the sections are still loaded by the main file
+    assert r"\usepackage{graphicx}" in main
+
+    assert doc.dumps() == before
+    assert not list(tmp_path.glob("article-*.tex"))
+
+
+def test_generate_pdf_include_only(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    outputs = []
+
+    def compile(self, filepath, **kwargs):
+        outputs.append(self.dumps())
+        pathlib.Path(f"{filepath}.tex").write_text(outputs[-1])
+
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+    doc = _sectioned_document()
+    results = doc.data[-1]
+    doc.generate_archive(
+        tmp_path / "article",
+        include_only=["Introduction", results],
+    )
+
+    (main,) = outputs
+    assert r"\includeonly{article-Introduction,article-Results}" in main
+    assert r"\include{article-Methods}" in main
+
+    with zipfile.ZipFile(tmp_path / "article.zip") as f:
+        names = f.namelist()
+    assert "article-Methods.tex" in names
+
+
+@pytest.mark.parametrize(
+    argnames="kwargs,match",
+    argvalues=[
+        (dict(include=True), "share the title 'Results'"),
+        (dict(include_only=["Introduction", "Resutls"]), "Resutls"),
+    ],
+)
+def test_generate_pdf_include_error(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+    kwargs: dict,
+    match: str,
+):
+    """Sections are never silently lost from an article."""
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    doc = _sectioned_document()
+    if "include" in kwargs:
+        doc.append(aastex.Section("Results"))
+
+    with pytest.raises(ValueError, match=match):
+        doc.generate_pdf(tmp_path / "article", **kwargs)
+
+    assert not list(tmp_path.glob("article-*.tex"))
+
+
+def test_generate_pdf_text_only(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+):
+    outputs = []
+    monkeypatch.setattr(
+        pylatex.Document,
+        "generate_pdf",
+        lambda self, *args, **kwargs: outputs.append(self.dumps()),
+    )
+
+    def plot() -> matplotlib.figure.Figure:
+        raise AssertionError("a figure was created for a text-only build")
+
+    fig = plt.figure(figsize=(4, 2))
+
+    # existing images, and the file of a lazy figure from the previous build
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for size, path in [
+        ((3, 1), sources / "wide.png"),
+        ((2, 3), sources / "tall.pdf"),
+        ((5, 1), tmp_path / "lazy.pdf"),
+    ]:
+        source = plt.figure(figsize=size)
+        source.savefig(path, dpi=100)
+        plt.close(source)
+
+    doc = aastex.Document()
+    figure = aastex.FigureStar("direct")
+    figure.add_fig(fig, width=None)
+    doc.append(figure)
+    grid = aastex.Figure("grid")
+    grid.append(
+        aastex.Gridline(
+            [
+                aastex.Fig(plot, "0.5\\textwidth", "lazy", filename="lazy"),
+                aastex.Fig(tmp_path / "missing.png", "0.5\\textwidth", "file"),
+            ]
+        )
+    )
+    doc.append(grid)
+    for source in ["wide.png", "tall.pdf"]:
+        figure = aastex.Figure(source)
+        figure.add_image(sources / source, width=None)
+        doc.append(figure)
+
+    doc.generate_pdf(tmp_path / "article", text_only=True)
+
+    (output,) = outputs
+    assert r"\setkeys{Gin}{draft}" in output
+    assert r"\includegraphics{direct-placeholder.pdf}" in output
+    assert r"\fig{lazy-placeholder.pdf}" in output
+    assert r"\fig{missing-placeholder.pdf}" in output
+
+    assert not (tmp_path / "direct.pdf").exists()
+    placeholder = (tmp_path / "direct-placeholder.pdf").read_text()
+    assert placeholder.startswith("%PDF")
+    assert "/MediaBox [0 0 288.00 144.00]" in placeholder
+
+    sizes = {
+        "lazy": "360.00 72.00",
+        "missing": "460.80 345.60",
+        "wide": "216.00 72.00",
+        "tall": "144.00 216.00",
+    }
+    for name, size in sizes.items():
+        placeholder = (tmp_path / f"{name}-placeholder.pdf").read_text()
+        assert f"/MediaBox [0 0 {size}]" in placeholder
+
+    assert r"\setkeys" not in doc.dumps()
+
+
+def test_generate_variants(tmp_path: pathlib.Path):
+    calls = []
+
+    def plot() -> matplotlib.figure.Figure:
+        calls.append(None)
+        return _plot()
+
+    doc = _submittable_document()
+    figure = aastex.Figure("lazy")
+    figure.add_fig(plot, width=None)
+    doc.append(figure)
+
+    results = doc.generate_variants(
+        variants=dict(
+            review=["twocolumn", "linenumbers"],
+            final="twocolumn",
+        ),
+        filepath=tmp_path / "article",
+        jobs=2,
+        **_fake_compiler_args(0.1),
+    )
+
+    assert list(results) == ["review", "final"]
+    assert all(result.ok for result in results.values())
+    assert all(result.seconds > 0 for result in results.values())
+    assert results["final"].document_options == ["twocolumn"]
+
+    review = (tmp_path / "review" / "article.pdf").read_text()
+    final = (tmp_path / "final" / "article.pdf").read_text()
+    assert r"\documentclass[twocolumn,linenumbers]{aastex701}" in review
+    assert r"\documentclass[twocolumn]{aastex701}" in final
+
+    # the images are saved once and shared between the variants
+    assert len(calls) == 1
+    shared = tmp_path / "lazy.pdf"
+    for name in results:
+        assert (tmp_path / name / "lazy.pdf").samefile(shared)
+        assert not (tmp_path / name / "article.tex").exists()
+        assert not (tmp_path / name / "aastex701.cls").exists()
+
+    assert doc.documentclass.options._positional_args == ["twocolumn", "linenumbers"]
+
+
+def test_generate_variants_error(tmp_path: pathlib.Path):
+    """A variant which fails does not stop the others."""
+    doc = _submittable_document()
+
+    results = doc.generate_variants(
+        variants=dict(
+            good=["twocolumn"],
+            bad=["twocolumn"],
+        ),
+        filepath=tmp_path / "article",
+        timeout=1,
+        compiler=sys.executable,
+        compiler_args=[
+            "-c",
+            _fake_compiler_script + "\nassert 'bad' not in str(tex)",
+            "0",
+        ],
+    )
+
+    assert results["good"].ok
+    assert isinstance(results["bad"].error, subprocess.CalledProcessError)
+    assert (tmp_path / "good" / "article.pdf").exists()
+
+
+def test_generate_variants_running_loop(tmp_path: pathlib.Path):
+    """Variants can be compiled from inside an event loop, as in a notebook."""
+    doc = _submittable_document()
+
+    async def main() -> dict[str, aastex.Variant]:
+        return doc.generate_variants(
+            variants=dict(final="twocolumn"),
+            filepath=tmp_path / "article",
+            **_fake_compiler_args(0),
+        )
+
+    results = asyncio.run(main())
+
+    assert results["final"].ok
+
+
+def test_generate_variants_lazy_variables(tmp_path: pathlib.Path):
+    """The lazy variables are computed once for all of the variants."""
+    calls = []
+
+    def compute(value: u.Quantity) -> Callable[[], u.Quantity]:
+        def function() -> u.Quantity:
+            calls.append(value)
+            return value
+
+        return function
+
+    doc = _submittable_document()
+    doc.set_variable_quantity("speed", compute(3 * u.m / u.s))
+    doc.set_variable_quantity("unused", compute(1 * u.kg))
+    doc.append(pylatex.NoEscape(r"\speed"))
+
+    results = doc.generate_variants(
+        variants=dict(review=["linenumbers"], final=["twocolumn"]),
+        filepath=tmp_path / "article",
+        clean_tex=False,
+        **_fake_compiler_args(0),
+    )
+
+    assert calls == [3 * u.m / u.s]
+    for result in results.values():
+        tex = result.filepath.with_name(f"{result.filepath.name}.tex").read_text()
+        assert r"\newcommand{\speed}" in tex
+        assert r"\unused" not in tex
+
+
+@pytest.mark.parametrize(
+    argnames="format,suffix",
+    argvalues=[
+        ("zip", ".zip"),
+        ("gztar", ".tar.gz"),
+    ],
+)
+def test_generate_archive(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    format: str,
+    suffix: str,
+):
+    doc = _submittable_document()
+    _fake_compiler(monkeypatch)
+
+    archive = doc.generate_archive(tmp_path / "article", format=format)
+
+    assert archive == (tmp_path / "article").with_suffix(suffix)
+    assert archive.exists()
+
+    if format == "zip":
+        with zipfile.ZipFile(archive) as f:
+            names = f.namelist()
+    else:
+        with tarfile.open(archive) as f:
+            names = f.getnames()
+
+    # the AAS submission system cannot parse subdirectories
+    assert not any("/" in name for name in names)
+
+    assert set(names) == {
+        "article.tex",
+        "article.bbl",
+        "aastex701.cls",
+        "aasjournalv7.bst",
+        "orcid-ID.png",
         "myFigure.pdf",
     }
 
 
+def test_generate_archive_symlink(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Linked images are archived by content rather than as links."""
+    source = tmp_path / "diagram.png"
+    source.write_bytes(b"an image")
+
+    doc = _submittable_document()
+    figure = aastex.Figure("diagram")
+    figure.add_image(source, width=None)
+    doc.append(figure)
+    _fake_compiler(monkeypatch)
+
+    archive = doc.generate_archive(
+        tmp_path / "build" / "article",
+        format="gztar",
+        link="symlink",
+    )
+
+    with tarfile.open(archive) as f:
+        member = f.getmember("diagram.png")
+        assert member.isfile()
+        assert f.extractfile(member).read() == b"an image"
+
+
+@pytest.mark.parametrize("extension", ["png", "pdf"])
+def test_generate_pdf_deduplicate_release(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+    extension: str,
+):
+    """Identical figures are stored once even if they are released."""
+    doc = aastex.Document()
+    for label in ["d", "e"]:
+        figure = aastex.Figure(label)
+        figure.add_fig(_plot(), width=None, extension=extension)
+        doc.append(figure)
+    monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+    build = tmp_path / "build"
+    doc.generate_pdf(build / "article", deduplicate=True, release=True)
+
+    assert sorted(p.name for p in build.glob(f"*.{extension}")) == [f"d.{extension}"]
+    assert [image.filename for image in doc.images] == [f"d.{extension}"] * 2
+
+
+def test_generate_archive_deduplicate(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    doc = _submittable_document()
+    for label in ["a", "b"]:
+        figure = aastex.Figure(label)
+        figure.add_fig(_plot(), width=None, extension="png")
+        doc.append(figure)
+    _fake_compiler(monkeypatch)
+
+    archive = doc.generate_archive(tmp_path / "article", deduplicate=True)
+
+    with zipfile.ZipFile(archive) as f:
+        names = set(f.namelist())
+
+    assert "a.png" in names
+    assert "b.png" not in names
+
+
 def test_generate_archive_bibliography(
     tmp_path: pathlib.Path,
     monkeypatch: pytest.MonkeyPatch,
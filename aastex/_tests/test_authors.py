@@ -0,0 +1,120 @@
+import pathlib
+
+import pytest
+import numpy as np
+import astropy.table
+import pylatex
+import aastex
+
+_authors = [
+    aastex.Author(
+        name="Ja_ne & D%oe{}~",
+        affiliation=[aastex.Affiliation("U_1 & co"), aastex.Affiliation("X")],
+        altaffiliation="Dec^eased",
+        email="j_d@x.edu",
+        orcid="0000-0001",
+        corresponding=True,
+    ),
+    aastex.Author(
+        name=pylatex.NoEscape(r"Jos\'e"),
+        affiliation=aastex.Affiliation("X"),
+    ),
+    aastex.Author(
+        name="John",
+        affiliation=aastex.Affiliation("U_1 & co"),
+        email="john@x.edu",
+    ),
+    aastex.Author(
+        name="Nobody",
+        affiliation=[],
+    ),
+]
+
+
+def _expected(authors: list[aastex.Author]) -> str:
+    return "%\n".join(a.dumps() for a in authors)
+
+
+def test_dumps():
+    authors = aastex.AuthorList(_authors)
+    assert authors.dumps() == _expected(_authors)
+    assert len(authors.affiliations) == 2
+
+
+def test_getitem():
+    authors = aastex.AuthorList(_authors)
+    assert len(authors) == len(_authors)
+    assert _expected(list(authors)) == _expected(_authors)
+    assert authors[1].affiliation is authors[0].affiliations[1]
+
+
+def test_document():
+    doc = aastex.Document()
+    doc += _authors
+    expected = doc.dumps()
+
+    doc = aastex.Document()
+    doc.append(aastex.AuthorList(_authors))
+    assert doc.dumps() == expected
+
+
+def test_read(tmp_path: pathlib.Path):
+    path = tmp_path / "authors.csv"
+    path.write_text(
+        "name,affiliation,email,orcid,corresponding\n"
+        "Jane Doe,Fancy University; Other Place,jane@fancy.edu,0000-0001,yes\n"
+        "John Doe,Fancy University,,,\n"
+    )
+
+    authors = aastex.AuthorList.read(path)
+
+    expected = [
+        aastex.Author(
+            name="Jane Doe",
+            affiliation=[
+                aastex.Affiliation("Fancy University"),
+                aastex.Affiliation("Other Place"),
+            ],
+            email="jane@fancy.edu",
+            orcid="0000-0001",
+            corresponding=True,
+        ),
+        aastex.Author(
+            name="John Doe",
+            affiliation=aastex.Affiliation("Fancy University"),
+        ),
+    ]
+    assert authors.dumps() == _expected(expected)
+    assert len(authors.affiliations) == 2
+
+
+@pytest.mark.parametrize("masked", [False, True])
+def test_from_table(masked: bool):
+    table = astropy.table.Table(
+        dict(
+            name=["Jane Doe", "John Doe"],
+            affiliation=["Fancy University", "Fancy University"],
+            email=["jane@fancy.edu", ""],
+            corresponding=np.array([True, False]),
+        ),
+        masked=masked,
+    )
+    if masked:
+        table["email"].mask = [False, True]
+
+    authors = aastex.AuthorList.from_table(table)
+
+    expected = [
+        aastex.Author(
+            name="Jane Doe",
+            affiliation=aastex.Affiliation("Fancy University"),
+            email="jane@fancy.edu",
+            corresponding=True,
+        ),
+        aastex.Author(
+            name="John Doe",
+            affiliation=aastex.Affiliation("Fancy University"),
+        ),
+    ]
+    assert authors.dumps() == _expected(expected)
+    assert len(authors.affiliations) == 1
@@ -0,0 +1,265 @@
+import os
+import pathlib
+import shutil
+
+import pytest
+import pylatex
+import numpy as np
+import matplotlib
+import matplotlib.ticker
+
+matplotlib.use("agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import aastex  # noqa: E402
+from aastex._cache import _figure_key  # noqa: E402
+
+
+def _plot(data: list[float]) -> matplotlib.figure.Figure:
+    fig, ax = plt.subplots()
+    ax.plot(data)
+    plt.close(fig)
+    return fig
+
+
+def _document(data: list[float]) -> aastex.Document:
+    figure = aastex.Figure("myFigure")
+    figure.add_fig(_plot(data), width=None, extension="png")
+    doc = aastex.Document()
+    doc.append(figure)
+    return doc
+
+
+def test_figure_key():
+    """Identical figures have the same key, even if pyplot numbered them differently."""
+    a = _figure_key(_plot([1, 2, 3]), (), {}, ".pdf")
+    b = _figure_key(_plot([1, 2, 3]), (), {}, ".pdf")
+    assert a == b
+
+    assert a != _figure_key(_plot([1, 2, 4]), (), {}, ".pdf")
+    assert a != _figure_key(_plot([1, 2, 3]), (), {"dpi": 50}, ".pdf")
+    assert a != _figure_key(_plot([1, 2, 3]), (), {}, ".png")
+
+
+@pytest.mark.parametrize("extension", ["pdf", "png"])
+def test_image_write_twice(tmp_path: pathlib.Path, extension: str):
+    """An unchanged figure is found in the cache even after it was drawn."""
+    cache = aastex.RenderCache(tmp_path / "cache")
+    fig = _plot([1, 2, 3])
+    figure = aastex.Figure("myFigure")
+    figure.add_fig(fig, width=None, extension=extension)
+    (image,) = figure.images
+
+    for i in range(3):
+        image.write(tmp_path, cache=cache)
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    fig.axes[0].set_title("Changed")
+    image.write(tmp_path, cache=cache)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_image_write_unpicklable(
+    tmp_path: pathlib.Path,
+    caplog: pytest.LogCaptureFixture,
+):
+    """A figure which cannot be hashed is saved without the cache."""
+    cache = aastex.RenderCache(tmp_path / "cache")
+    fig = _plot([1, 2, 3])
+    fig.axes[0].xaxis.set_major_formatter(
+        matplotlib.ticker.FuncFormatter(lambda x, pos: f"{x} m")
+    )
+    figure = aastex.Figure("myFigure")
+    figure.add_fig(fig, width=None, extension="png")
+    (image,) = figure.images
+
+    image.write(tmp_path, cache=cache)
+
+    assert (tmp_path / "myFigure.png").exists()
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert "without the cache" in caplog.text
+
+
+class TestRenderCache:
+    def test_fetch_store(self, tmp_path: pathlib.Path):
+        cache = aastex.RenderCache(tmp_path / "cache")
+        destination = tmp_path / "image.png"
+
+        assert not cache.fetch("key", destination)
+        assert not destination.exists()
+
+        source = tmp_path / "source.png"
+        source.write_bytes(b"an image")
+        cache.store("key", source)
+
+        assert cache.fetch("key", destination)
+        assert destination.read_bytes() == b"an image"
+
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_evict(self, tmp_path: pathlib.Path):
+        cache = aastex.RenderCache(tmp_path / "cache", max_bytes=10)
+
+        for i, key in enumerate(["old", "used", "new"]):
+            source = tmp_path / f"{key}.png"
+            source.write_bytes(b"12345")
+            cache.store(key, source)
+            os.utime(cache.directory / f"{key}.png", (i, i))
+            if key == "used":
+                cache.fetch("old", tmp_path / "fetched.png")
+
+        assert sorted(p.name for p in cache.directory.iterdir()) == [
+            "new.png",
+            "old.png",
+        ]
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_generate_pdf(
+        self,
+        tmp_path: pathlib.Path,
+        monkeypatch: pytest.MonkeyPatch,
+        workers: None | int,
+    ):
+        monkeypatch.setattr(pylatex.Document, "generate_pdf", lambda *a, **k: None)
+
+        cache = aastex.RenderCache(tmp_path / "cache")
+
+        for build in ["first", "second"]:
+            doc = _document(np.arange(10))
+            doc.generate_pdf(tmp_path / build / "article", cache=cache, workers=workers)
+
+        assert cache.misses == 1
+        assert cache.hits == 1
+
+        first = tmp_path / "first" / "myFigure.png"
+        second = tmp_path / "second" / "myFigure.png"
+        assert first.read_bytes() == second.read_bytes()
+
+        _document(np.arange(11)).generate_pdf(
+            tmp_path / "third" / "article", cache=cache
+        )
+
+        assert cache.misses == 2
+
+
+class TestFormatCache:
+    def test_key(self, tmp_path: pathlib.Path):
+        cache = aastex.FormatCache(tmp_path)
+        assert cache.key("a preamble") == cache.key("a preamble")
+        assert cache.key("a preamble") != cache.key("another preamble")
+
+    def test_generate_pdf(
+        self,
+        tmp_path: pathlib.Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        def build(self, key, preamble):
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.path(key).write_text(preamble)
+
+        monkeypatch.setattr(aastex.FormatCache, "build", build)
+
+        outputs = []
+
+        def compile(self, filepath, **kwargs):
+            outputs.append(self.dumps())
+            assert len(list(pathlib.Path(filepath).parent.glob("*.fmt"))) == 1
+
+        monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+        cache = aastex.FormatCache(tmp_path / "formats")
+        doc = _document(np.arange(10))
+        doc.set_variable("foo", "bar")
+        doc.generate_pdf(tmp_path / "build" / "article", format_cache=cache)
+
+        (output,) = outputs
+        (fmt,) = cache.directory.iterdir()
+        first, rest = output.split("\n", 1)
+        assert first == f"%&{fmt.stem}"
+
+        # the variables are read on every pass rather than dumped
+        dumped, marker, live = rest.partition(r"\csname endofdump\endcsname")
+        assert marker
+        assert dumped == fmt.read_text()
+        assert r"\newcommand{\foo}{bar}" in live
+
+        # without a format cache, the output is the same as before
+        assert doc.dumps() == rest.replace(marker + "%\n", "")
+
+        assert not list((tmp_path / "build").glob("*.fmt"))
+
+    def test_generate_pdf_unavailable(
+        self,
+        tmp_path: pathlib.Path,
+        monkeypatch: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+    ):
+        outputs = []
+
+        def compile(self, filepath, **kwargs):
+            outputs.append(self.dumps())
+
+        monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+        cache = aastex.FormatCache(tmp_path / "formats", engine="not-an-engine")
+        doc = _document(np.arange(10))
+        doc.generate_pdf(tmp_path / "build" / "article", format_cache=cache)
+
+        assert outputs == [doc.dumps()]
+        assert "without a precompiled preamble" in caplog.text
+
+    def test_generate_pdf_other_compiler(
+        self,
+        tmp_path: pathlib.Path,
+        monkeypatch: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+    ):
+        """Only pdfLaTeX can load the formats, so other compilers skip them."""
+
+        def build(self, key, preamble):
+            raise AssertionError("the format should not be dumped")
+
+        monkeypatch.setattr(aastex.FormatCache, "build", build)
+
+        outputs = []
+
+        def compile(self, filepath, **kwargs):
+            outputs.append(self.dumps())
+
+        monkeypatch.setattr(pylatex.Document, "generate_pdf", compile)
+
+        cache = aastex.FormatCache(tmp_path / "formats")
+        doc = _document(np.arange(10))
+        doc.generate_pdf(
+            tmp_path / "build" / "article",
+            format_cache=cache,
+            compiler="xelatex",
+        )
+
+        assert outputs == [doc.dumps()]
+        assert "not 'xelatex'" in caplog.text
+
+    @pytest.mark.skipif(
+        shutil.which("latexmk") is None,
+        reason="requires a LaTeX installation",
+    )
+    def test_generate_pdf_compiles(
+        self,
+        tmp_path: pathlib.Path,
+        caplog: pytest.LogCaptureFixture,
+    ):
+        """A precompiled preamble is dumped once and loaded by pdfLaTeX."""
+        cache = aastex.FormatCache(tmp_path / "formats")
+        doc = _document(np.arange(10))
+        doc.set_variable("foo", "bar")
+        doc.append(pylatex.NoEscape(r"\foo"))
+        pdf = tmp_path / "build" / "article.pdf"
+
+        for i in range(2):
+            pdf.unlink(missing_ok=True)
+            doc.generate_pdf(tmp_path / "build" / "article", format_cache=cache)
+            assert pdf.exists()
+
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert "without a precompiled preamble" not in caplog.text
@@ -0,0 +1,95 @@
+import pytest
+import numpy as np
+import astropy.units as u
+import aastex
+from aastex._formatting import _latex_quantity, _format_scalars
+
+_quantities = [
+    3 * u.AA,
+    3.14159265358979 * u.km / u.s,
+    1e-12 * u.erg / u.s / u.cm**2,
+    45 * u.deg,
+    0 * u.m,
+    -2.5e20 * u.Jy,
+    np.int64(7) * u.s,
+    1.5 * u.dimensionless_unscaled,
+    [1, 2] * u.m,
+    (1 + 2j) * u.m,
+]
+
+
+@pytest.mark.parametrize("a", _quantities)
+def test_latex_quantity(a: u.Quantity):
+    assert _latex_quantity(a) == format(a, "latex_inline")
+
+
+def test_unit_cache_info():
+    unit = u.km / u.s / u.Mpc
+    aastex.format_quantity(70 * unit)
+    before = aastex.unit_cache_info()
+
+    aastex.format_quantity(71 * unit)
+    aastex.Variable("hubble", 72 * unit).dumps()
+
+    after = aastex.unit_cache_info()
+    assert after.hits == before.hits + 2
+    assert after.misses == before.misses
+    assert after.currsize <= after.maxsize
+
+
+@pytest.mark.parametrize("scientific_notation", [None, False, True])
+@pytest.mark.parametrize("digits_after_decimal", [0, 3])
+def test_format_scalars(scientific_notation: None | bool, digits_after_decimal: int):
+    rng = np.random.default_rng(0)
+    exponents = rng.integers(-20, 20, size=100)
+    value = rng.normal(size=100) * 10.0**exponents
+    a = np.append(value, [0, 0.1, -0.1]) * u.km / u.s
+
+    result = _format_scalars(a, scientific_notation, digits_after_decimal)
+
+    expected = [
+        aastex.format_quantity(x, scientific_notation, digits_after_decimal) for x in a
+    ]
+    assert result == expected
+
+
+def test_format_quantity_edgeitems():
+    a = np.arange(100_000) * u.m
+
+    result = aastex.format_quantity(a, edgeitems=2)
+
+    assert result == r"$[0.000, 1.000, \dots, 99998.000, 99999.000]\,$$\mathrm{m}$"
+
+
+def test_format_quantity_edgeitems_short():
+    a = [1, 2, 3] * u.s
+    assert (
+        aastex.format_quantity(a, edgeitems=2)
+        == r"$[1.000, 2.000, 3.000]\,$$\mathrm{s}$"
+    )
+
+
+def test_format_quantity_edgeitems_2d():
+    a = np.arange(12).reshape(3, 4) * u.s
+
+    result = aastex.format_quantity(a, digits_after_decimal=0, edgeitems=1)
+
+    assert result == r"$[[0, \dots, 3], \dots, [8, \dots, 11]]\,$$\mathrm{s}$"
+
+
+def test_format_quantity_scientific():
+    a = [0, 1.5e-5, -2e-3] * u.m
+
+    result = aastex.format_quantity(a, digits_after_decimal=1, edgeitems=3)
+
+    expected = r"$[0.0, 1.5 \times 10^{-5}, -2.0 \times 10^{-3}]\,$$\mathrm{m}$"
+    assert result == expected
+
+
+def test_format_quantity_shared_exponent():
+    a = [0, 1.5e-5, -2e-3] * u.m
+
+    result = aastex.format_quantity(a, digits_after_decimal=4, shared_exponent=True)
+
+    expected = r"$[0.0000, 0.0150, -2.0000] \times 10^{-3}\,$$\mathrm{m}$"
+    assert result == expected
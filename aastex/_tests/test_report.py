@@ -0,0 +1,192 @@
+import json
+import pathlib
+import sys
+import zipfile
+
+import pytest
+import pylatex
+import matplotlib
+
+matplotlib.use("agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import astropy.units as u  # noqa: E402
+import aastex  # noqa: E402
+
+_fake_latexmk = """
+import pathlib, sys, time
+tex = pathlib.Path(sys.argv[-1])
+for rule in ["pdflatex", "bibtex article", "pdflatex"]:
+    print(f"Run number 1 of rule '{rule}'", flush=True)
+    time.sleep(0.05)
+tex.with_suffix(".bbl").write_text("a formatted bibliography")
+tex.with_suffix(".pdf").write_text(tex.read_text())
+"""
+"""
+A stand in for ``latexmk``, run as ``python -c``, which announces three passes
+like ``latexmk`` does, and then copies the ``.tex`` file to the ``.pdf`` file.
+"""
+
+
+def _document() -> aastex.Document:
+    fig, ax = plt.subplots()
+    ax.plot([1, 2, 3])
+    plt.close(fig)
+
+    figure = aastex.Figure("myFigure")
+    figure.add_fig(fig, width=None)
+
+    doc = aastex.Document()
+    doc.append(figure)
+    return doc
+
+
+def test_generate_pdf(tmp_path: pathlib.Path):
+    report = aastex.BuildReport()
+
+    _document().generate_pdf(
+        tmp_path / "article",
+        compiler=sys.executable,
+        compiler_args=["-c", _fake_latexmk],
+        report=report,
+    )
+
+    assert [stage.name for stage in report.stages] == [
+        "traversal",
+        "support",
+        "images",
+        "tex",
+        "compile",
+    ]
+    assert all(stage.wall >= 0 for stage in report.stages)
+    assert report.wall == sum(stage.wall for stage in report.stages)
+
+    stages = {stage.name: stage for stage in report.stages}
+    assert stages["tex"].bytes > 0
+    assert stages["compile"].bytes == stages["tex"].bytes
+
+    (image,) = report.images
+    assert image.name == "myFigure.pdf"
+    assert image.bytes == (tmp_path / "myFigure.pdf").stat().st_size
+    assert stages["images"].bytes == image.bytes
+
+    assert [p.name for p in report.passes] == [
+        "pdflatex",
+        "bibtex article",
+        "pdflatex",
+    ]
+    assert all(p.wall > 0 for p in report.passes)
+
+    assert not (tmp_path / "article.tex").exists()
+
+
+def test_generate_pdf_single_pass(tmp_path: pathlib.Path):
+    """A compiler which does not announce its passes counts as one pass."""
+    report = aastex.BuildReport()
+
+    _document().generate_pdf(
+        tmp_path / "article",
+        compiler=sys.executable,
+        compiler_args=["-c", "import time; time.sleep(0.05)"],
+        report=report,
+    )
+
+    (single,) = report.passes
+    assert single.name == pathlib.Path(sys.executable).name
+    assert single.wall > 0
+
+
+def test_generate_pdf_variables(tmp_path: pathlib.Path):
+    """Computing lazy variables is a stage of its own."""
+    report = aastex.BuildReport()
+
+    doc = _document()
+    doc.set_variable_quantity("speed", lambda: 3e8 * u.m / u.s)
+    doc.append(pylatex.NoEscape(r"\speed"))
+    doc.generate_pdf(
+        tmp_path / "article",
+        compiler=sys.executable,
+        compiler_args=["-c", _fake_latexmk],
+        report=report,
+    )
+
+    names = [stage.name for stage in report.stages]
+    assert names.index("variables") == names.index("tex") - 1
+    assert r"\newcommand{\speed}" in (tmp_path / "article.pdf").read_text()
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_generate_archive(tmp_path: pathlib.Path, workers: None | int):
+    report = aastex.BuildReport()
+
+    archive = _document().generate_archive(
+        tmp_path / "article",
+        compiler=sys.executable,
+        compiler_args=["-c", _fake_latexmk],
+        report=report,
+        workers=workers,
+    )
+
+    assert report.stages[-1].name == "archive"
+    assert report.stages[-1].bytes == archive.stat().st_size
+    assert [i.name for i in report.images] == ["myFigure.pdf"]
+
+    with zipfile.ZipFile(archive) as f:
+        assert "article.bbl" in f.namelist()
+
+
+def test_to_json():
+    report = aastex.BuildReport()
+    with report.stage("example") as stage:
+        stage.bytes = 10
+
+    result = json.loads(report.to_json())
+
+    assert result["stages"][0]["name"] == "example"
+    assert result["stages"][0]["bytes"] == 10
+    assert result["images"] == []
+    assert result["passes"] == []
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_events(tmp_path: pathlib.Path, workers: None | int):
+    events = []
+
+    doc = _document()
+    figure = aastex.Figure("another")
+    figure.add_fig(doc.images[0].figure, width=None, extension="png")
+    doc.append(figure)
+    doc.on_event = events.append
+
+    doc.generate_archive(
+        tmp_path / "article",
+        compiler=sys.executable,
+        compiler_args=["-c", _fake_latexmk],
+        workers=workers,
+    )
+
+    kinds = [event.kind for event in events]
+    assert kinds[:3] == ["traversal", "image", "image"]
+    assert events[0].total == 2
+    assert [(e.name, e.index, e.total) for e in events[1:3]] == [
+        ("myFigure.pdf", 1, 2),
+        ("another.png", 2, 2),
+    ]
+
+    passes = [(e.kind, e.name, e.index) for e in events if "pass" in e.kind]
+    assert passes == [
+        ("pass_started", "pdflatex", 1),
+        ("pass_finished", "pdflatex", 1),
+        ("pass_started", "bibtex article", 2),
+        ("pass_finished", "bibtex article", 2),
+        ("pass_started", "pdflatex", 3),
+        ("pass_finished", "pdflatex", 3),
+    ]
+    assert all(e.seconds > 0 for e in events if e.kind == "pass_finished")
+
+    members = [e for e in events if e.kind == "archive_member"]
+    assert [e.index for e in members] == list(range(1, len(members) + 1))
+    assert all(e.total == len(members) for e in members)
+    assert "another.png" in [e.name for e in members]
+
+    assert [e.time for e in events] == sorted(e.time for e in events)
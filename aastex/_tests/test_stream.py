@@ -0,0 +1,95 @@
+import io
+import pathlib
+
+import pytest
+import pylatex
+import matplotlib
+
+matplotlib.use("agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import astropy.units as u  # noqa: E402
+import aastex  # noqa: E402
+from aastex._stream import _lstrip, _rstrip  # noqa: E402
+
+
+def _document() -> aastex.Document:
+    doc = aastex.Document()
+    doc.set_variable_quantity("speed", 3e8 * u.m / u.s)
+    doc.preamble.append(aastex.Acronym("AAS", "American Astronomical Society"))
+    doc.append(aastex.Title("An interesting article"))
+    doc += [
+        aastex.Author(
+            name=f"Author {i}",
+            affiliation=aastex.Affiliation(f"University {i % 3}"),
+        )
+        for i in range(5)
+    ]
+
+    abstract = aastex.Abstract()
+    abstract.append("A summary with special characters: 100% & $5.")
+    doc.append(abstract)
+
+    for title in ["Introduction", "Empty", "Results"]:
+        section = aastex.Section(title)
+        if title != "Empty":
+            section.append("Some text.")
+            subsection = aastex.Subsection("Details", label=False)
+            subsection.append(pylatex.NoEscape(r"\speed is fast."))
+            section.append(subsection)
+        doc.append(section)
+
+    fig, ax = plt.subplots()
+    plt.close(fig)
+    figure = aastex.FigureStar("myFigure")
+    figure.add_fig(fig, width=None)
+    figure.add_caption("A caption.")
+    doc.append(figure)
+
+    table = pylatex.Tabular("ll")
+    table.add_row(["a", "b"])
+    doc.append(table)
+
+    doc.append("Text with special characters: 100% & $5.")
+    doc.append(pylatex.Command("clearpage"))
+    doc.append(aastex.Bibliography("sources"))
+    return doc
+
+
+def test_iterdumps():
+    doc = _document()
+    expected = pylatex.Document.dumps(doc)
+
+    chunks = list(doc.iterdumps())
+
+    assert len(chunks) > 10
+    assert "".join(chunks) == expected
+    assert doc.dumps() == expected
+
+
+def test_dump():
+    doc = _document()
+    f = io.StringIO()
+    doc.dump(f)
+    assert f.getvalue() == doc.dumps()
+
+
+def test_generate_tex(tmp_path: pathlib.Path):
+    doc = _document()
+    doc.generate_tex(str(tmp_path / "article"))
+    assert (tmp_path / "article.tex").read_text() == doc.dumps()
+
+
+@pytest.mark.parametrize(
+    argnames="chunks",
+    argvalues=[
+        [],
+        ["\n", "\n"],
+        ["\n\na", "b\n", "\nc\n\n", "\n"],
+        ["a\n", "", "b"],
+    ],
+)
+def test_strip(chunks: list[str]):
+    text = "".join(chunks)
+    assert "".join(_lstrip(chunks)) == text.lstrip("\n")
+    assert "".join(_rstrip(chunks)) == text.rstrip("\n")